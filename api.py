@@ -10,54 +10,111 @@ import socket
 import shutil
 import subprocess
 import threading
-from typing import Optional, Tuple
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
 
 import config
 from event_log import EventLog
 from relay import RelayController
-from display_ctl import DisplayController
+from display_ctl import DisplayController, parse_geometry
 from overlay_black import BlackOverlay
-from rtsp_player import RtspPlayer
+from rtsp_player import RtspPlayer, RtspStandby
+from stream_probe import StreamProbeCache
 from touch_ctl import TouchController
 from keyboard_wake import KeyboardWake
 from mqtt_bridge import MqttBridge
-
-# Base64 black png
-BLACK_PNG_B64 = """
-iVBORw0KGgoAAAANSUhEUgAAB4AAAAQ4AQAAAADAqPzuAAAAIGNIUk0AAHomAACAhAAA+gAAAIDo
-AAB1MAAA6mAAADqYAAAXcJy6UTwAAAACYktHRAAB3YoTpAAAAAd0SU1FB+oBBRMPE2zzC/4AAAET
-SURBVHja7cEBDQAAAMKg909tDwcUAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAA
-AAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAAADApwH45QAB/OGP/gAA
-ACV0RVh0ZGF0ZTpjcmVhdGUAMjAyNi0wMS0wNVQxOToxNToxOCswMDowMBGu0N8AAAAldEVYdGRh
-dGU6bW9kaWZ5ADIwMjYtMDEtMDVUMTk6MTU6MTgrMDA6MDBg82hjAAAAKHRFWHRkYXRlOnRpbWVz
-dGFtcAAyMDI2LTAxLTA1VDE5OjE1OjE4KzAwOjAwN+ZJvAAAAABJRU5ErkJggg==
-""".strip()
+from scheduler import DeadlineScheduler, Worker
+from input_reactor import InputReactor
+from mpv_ipc import MpvIpc
+from proc_supervisor import ProcessSupervisor
+from latency import LatencyTracker
 
 app = FastAPI(title="Spiegel klein", version="7.1-mqtt-streaming")
 
 hostname = socket.gethostname()
 log = EventLog(maxlen=400)
+scheduler = DeadlineScheduler(log)
+input_reactor = InputReactor(log)
+# Wake aus Input-Callbacks: X11-/mpv-Roundtrips nicht auf dem Reactor-Thread
+wake_worker = Worker(log, "Wake")
+latency = LatencyTracker()
+supervisor = ProcessSupervisor(log, scheduler)
+
+display = DisplayController(display_default=config.DISPLAY, xauthority_env=config.XAUTHORITY, log=log,
+                            backend=config.DISPLAY_BACKEND,
+                            wake_window=config.DISPLAY_WAKE_WINDOW_MS / 1000.0,
+                            geometry=parse_geometry(config.DISPLAY_GEOMETRY))
+relay = RelayController(config.DEVICE_RELAY, config.BAUDRATE, log,
+                        reconnect_interval=config.RELAY_RECONNECT_INTERVAL,
+                        coalesce_ms=config.RELAY_COALESCE_MS,
+                        scheduler=scheduler,
+                        channels=config.RELAY_CHANNELS,
+                        channel_names=config.RELAY_CHANNEL_NAMES)
+mpv = MpvIpc(display, log, config.MPV_IPC_SOCKET, log_path=config.RTSP_LOG_PATH,
+             supervisor=supervisor) if config.MPV_IPC else None
+overlay = BlackOverlay(config.BLACK_PNG_PATH, display, log, mpv=mpv,
+                       backend=config.OVERLAY_BACKEND, supervisor=supervisor)
+rtsp_standby = None
+if mpv and config.RTSP_STANDBY and config.RTSP_DEFAULT_URL:
+    rtsp_standby = RtspStandby(
+        MpvIpc(display, log, config.RTSP_STANDBY_SOCKET, log_path=config.RTSP_LOG_PATH, supervisor=supervisor),
+        config.RTSP_DEFAULT_URL, log, scheduler,
+        pressure=lambda paused: rtsp_standby_pressure(paused),
+    )
+stream_probe = StreamProbeCache(log, ttl=config.RTSP_PROBE_TTL_SEC)
+rtsp = RtspPlayer(display, overlay, relay, log, config.RTSP_LOG_PATH, scheduler=scheduler, mpv=mpv,
+                  supervisor=supervisor, standby=rtsp_standby,
+                  stall_budget=config.RTSP_STALL_MS / 1000.0, reconnect_max=config.RTSP_RECONNECT_MAX_MS / 1000.0,
+                  probe=stream_probe)
+touch = TouchController(config.TOUCH_DEVICE_PATH, config.UNLOCK_TOUCHES, config.UNLOCK_WINDOW, log,
+                        refire_interval=config.TOUCH_REFIRE_MS / 1000.0, reactor=input_reactor,
+                        unlock_pattern=config.UNLOCK_PATTERN, scheduler=scheduler)
+
+def wake_screen(event_ts: float = 0.0, force: bool = False):
+    """
+    Display wake + Relay 5min + Overlay off während aktiv.
+    Jede Stufe wird in `latency` gemessen; event_ts = Kernel-Zeitstempel des
+    auslösenden Input-Events (0 = kein Input, z. B. MQTT/HTTP).
+    force=True umgeht das Wake-Fenster des DisplayControllers (explizite Befehle).
+    """
+    t0 = time.time()
+    if event_ts:
+        latency.record("input", t0 - event_ts)
+
+    with latency.span("display_wake"):
+        display.wake(force=force)
+
+    def _hide():
+        with latency.span("overlay_hide"):
+            overlay.hide()
 
-display = DisplayController(display_default=config.DISPLAY, xauthority_env=config.XAUTHORITY, log=log)
-relay = RelayController(config.DEVICE_RELAY, config.BAUDRATE, log)
-overlay = BlackOverlay(config.BLACK_PNG_PATH, BLACK_PNG_B64, display, log)
-rtsp = RtspPlayer(display, overlay, relay, log, config.RTSP_LOG_PATH)
-touch = TouchController(config.TOUCH_DEVICE_PATH, config.UNLOCK_TOUCHES, config.UNLOCK_WINDOW, log)
+    t_relay = time.time()
+    fut = relay.activate_for(config.RELAY_ON_TIME, on_start=_hide, on_end=overlay.show)
 
-# Touch-Event: Display wake + Relay 5min + Overlay off während aktiv
-def on_touch_event():
-    display.wake()
-    relay.activate_for(config.RELAY_ON_TIME, on_start=overlay.hide, on_end=overlay.show)
+    def _written(f):
+        # Relais geschaltet = Panel hat Licht (Overlay ist zu dem Zeitpunkt schon weg)
+        now = time.time()
+        latency.record("relay_write", now - t_relay)
+        latency.record("total", now - (event_ts or t0))
+
+    fut.add_done_callback(_written)
+    return fut
+
+
+def wake_from_input(event_ts: float):
+    # Reactor-Thread: nur Zeitstempel festhalten und weiterreichen;
+    # ein noch wartender Wake wird ersetzt (Touch-/Tastenstürme -> ein Wake)
+    wake_worker.submit("wake", lambda: wake_screen(event_ts))
 
-touch.set_on_touch(on_touch_event)
 
-# Tastendruck: Display wake + Relay 5min
+# Touch-Event
+touch.set_on_touch(lambda: wake_from_input(touch.last_frame_ts))
+
+# Tastendruck
 kbd = KeyboardWake(
     log,
-    on_keypress=lambda: (display.wake(), relay.activate_for(config.RELAY_ON_TIME, on_start=overlay.hide, on_end=overlay.show))
+    on_keypress=lambda: wake_from_input(kbd.last_event_ts),
+    reactor=input_reactor,
 )
 
 # RTSP config buffer (für HA Buttons "Start" ohne Payload)
@@ -71,6 +128,10 @@ class RtspRequest(BaseModel):
     url: str = Field(default=config.RTSP_DEFAULT_URL)
     seconds: int = Field(default=config.RTSP_DEFAULT_SECONDS, ge=5, le=3600)
     mode: str = Field(default="normal")  # normal | crop | stretch
+    # Mehrfachansicht: mehrere URLs in einem mpv (url wird dann ignoriert)
+    urls: List[str] = Field(default_factory=list)
+    layout: str = Field(default="grid")  # grid | pip
+    modes: List[str] = Field(default_factory=list)  # Modus pro URL, sonst gilt mode
 
 
 class RelayAction(BaseModel):
@@ -81,6 +142,10 @@ class StreamingAction(BaseModel):
     state: str  # on/off
 
 
+class RelayChannelsAction(BaseModel):
+    states: dict[str, str]  # {"panel": "on", "3": "off"}
+
+
 # ---------- Systemdaten (ohne extra deps) ----------
 
 _cpu_prev: Optional[Tuple[int, int]] = None  # (total, idle)
@@ -151,6 +216,22 @@ def _read_load1():
         return None
 
 
+def rtsp_standby_pressure(paused: bool):
+    """Grund, den RTSP-Standby abzuschalten (oder None). Im Pause-Zustand 5 °C / 15 % Hysterese."""
+    temp_max = config.RTSP_STANDBY_MAX_TEMP_C - (5 if paused else 0)
+    load_max = config.RTSP_STANDBY_MAX_LOAD_PCT - (15 if paused else 0)
+
+    temp = _read_cpu_temp_c()
+    if temp is not None and temp >= temp_max:
+        return f"CPU {temp}°C >= {temp_max}°C"
+    load1 = _read_load1()
+    if load1 is not None:
+        load_pct = load1 / (os.cpu_count() or 1) * 100.0
+        if load_pct >= load_max:
+            return f"Last {load_pct:.0f}% >= {load_max}%"
+    return None
+
+
 def _read_mem_used_pct():
     try:
         mem = {}
@@ -208,6 +289,8 @@ def take_screenshot_jpeg() -> Optional[bytes]:
             "-loglevel", "error",
             "-y",
             "-f", "x11grab",
+            # nur der sichtbare Ausgang (XRandR), nicht ein evtl. größerer virtueller Screen
+            "-video_size", "{}x{}".format(*display.geometry()),
             "-i", f"{env.get('DISPLAY', ':0')}.0",
             "-frames:v", "1",
             "-q:v", "3",
@@ -312,30 +395,30 @@ def system_stats():
 
 
 def display_remaining_seconds():
-    # 0 wenn dauerhaft an (force_on)
-    if bool(getattr(relay, "force_on", False)):
+    # 0 wenn dauerhaft an (force_on), None wenn kein Timer läuft
+    if relay.force_on:
         return 0
+    return relay.remaining_seconds()
 
-    if hasattr(relay, "remaining_seconds") and callable(getattr(relay, "remaining_seconds")):
-        try:
-            return int(relay.remaining_seconds())
-        except Exception:
-            return None
 
-    if hasattr(relay, "_end_ts") and getattr(relay, "_end_ts") is not None:
-        try:
-            return max(0, int(getattr(relay, "_end_ts") - time.time()))
-        except Exception:
-            return None
+def display_off_at_iso() -> Optional[str]:
+    """Absolute Ausschaltzeit (ISO 8601, UTC) – Clients zählen damit lokal herunter."""
+    ts = relay.off_at()
+    if ts is None:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
 
-    return None
+
+def _on_relay_timer_change():
+    # nur bei Änderung publizieren (Bridge dedupliziert)
+    mqtt_bridge.publish_display_off_at(display_off_at_iso())
 
 
 # ---------- MQTT wiring ----------
 
-def state_provider():
+def state_provider(fresh: bool = False):
     env = display.env()
-    relay_state = relay.status()
+    relay_state = relay.status(fresh=fresh)
     overlay_black = bool(overlay.running())
 
     # Screen: ON = relay an UND overlay aus
@@ -350,10 +433,24 @@ def state_provider():
         "screen_on": screen_on,
         "touch_on": touch_on,
         "rtsp": rtsp.info(),
+        "rtsp_standby": rtsp_standby.info() if rtsp_standby else None,
+        "stream_probe": stream_probe.info(),
+        "mpv": mpv.info() if mpv else None,
+        "processes": supervisor.info(),
         "touch_disabled": bool(touch.touch_disabled),
         "touch_locked": bool(touch.touch_locked),
+        "touch_stats": touch.stats(),
         "display_remaining_seconds": display_remaining_seconds(),
+        "display_off_at": display_off_at_iso(),
+        "relay_force_on": relay.force_on,
+        "relay_channels": relay.channel_states(),
+        "relay_drift": relay.drift_info(),
+        "relay_queue": relay.queue_info(),
+        "scheduler": scheduler.info(),
+        "input": input_reactor.info(),
+        "wake_latency": latency.info(),
         "display": env.get("DISPLAY"),
+        "display_backend": display.info(),
         "xauthority": env.get("XAUTHORITY", ""),
         "system": system_stats(),
         "streaming_active": rtsp_server_active(),
@@ -396,6 +493,23 @@ def command_handler(topic: str, payload: str):
             overlay.show()
         mqtt_bridge.publish_state_now()
 
+    elif cmd.startswith("relay_channel/"):
+        # Zusatzkanäle (panel, led, fan ...): ON/OFF
+        try:
+            relay.set_channel(cmd[len("relay_channel/"):], p.upper() == "ON")
+        except ValueError as e:
+            log.add(f"MQTT relay_channel: {e}")
+        mqtt_bridge.publish_state_now()
+
+    elif cmd == "relay_channels":
+        # Batch: {"panel":"ON","fan":"OFF"} -> ein Serial-Write
+        try:
+            j = json.loads(p) if p else {}
+            relay.set_channels({k: str(v).upper() == "ON" for k, v in j.items()})
+        except Exception as e:
+            log.add(f"MQTT relay_channels: bad payload ({e})")
+        mqtt_bridge.publish_state_now()
+
     elif cmd == "overlay_black":
         if p.upper() == "ON":
             overlay.show()
@@ -418,6 +532,9 @@ def command_handler(topic: str, payload: str):
     elif cmd == "rtsp_mode/set":
         if p in ("normal", "crop", "stretch"):
             rtsp_cfg["mode"] = p
+            # laufender Stream: live umschalten (ohne Neustart, Restzeit bleibt)
+            if rtsp.running():
+                rtsp.set_mode(p)
             mqtt_bridge.publish_state_now()
 
     elif cmd == "rtsp_seconds/set":
@@ -452,8 +569,7 @@ def command_handler(topic: str, payload: str):
 
     elif cmd == "screen_5min":
         if p.upper() == "PRESS":
-            display.wake()
-            relay.activate_for(config.RELAY_ON_TIME, on_start=overlay.hide, on_end=overlay.show)
+            wake_screen(force=True)
             mqtt_bridge.publish_state_now()
 
     elif cmd == "rtsp/start":
@@ -476,7 +592,12 @@ def command_handler(topic: str, payload: str):
             rtsp_cfg["mode"] = mode
             rtsp_cfg["seconds"] = sec
 
-            rtsp.start(url, sec, mode=mode)
+            # {"urls": [...], "layout": "grid"|"pip", "modes": [...]} -> Mehrfachansicht
+            urls = [str(u).strip() for u in j.get("urls", []) if str(u).strip().startswith("rtsp://")]
+            if len(urls) > 1:
+                rtsp.start_layout(urls, sec, layout=str(j.get("layout", "grid")), modes=j.get("modes") or mode)
+            else:
+                rtsp.start(url, sec, mode=mode)
             mqtt_bridge.publish_state_now()
         except Exception as e:
             log.add(f"MQTT rtsp/start: bad payload ({e})")
@@ -485,14 +606,11 @@ def command_handler(topic: str, payload: str):
         # ON: relay an + overlay aus
         # OFF: relay aus + overlay an
         if p.upper() == "ON":
-            display.wake()
+            display.wake(force=True)
             relay.on_permanent(on_start=overlay.hide)
         else:
             relay.cancel_timer()
-            try:
-                relay.off(force=True)
-            except TypeError:
-                relay.off()
+            relay.off(force=True)
             overlay.show()
         mqtt_bridge.publish_state_now()
 
@@ -528,35 +646,60 @@ def command_handler(topic: str, payload: str):
 
 
 mqtt_bridge = MqttBridge(config, log, state_provider=state_provider, command_handler=command_handler)
+relay.add_listener(_on_relay_timer_change)
 
 
 # ---------- Startup ----------
 
 @app.on_event("startup")
 def startup():
+    # Bildschirmgröße einmal abfragen, danach nur bei RandR-Änderungen
+    display.watch_geometry(input_reactor)
     overlay.ensure_png()
 
     # Idle: Relais aus + black
     relay.off()
     overlay.show()
 
+    relay.start_reconciler(config.RELAY_RECONCILE_INTERVAL)
     touch.start_monitor()
     kbd.start()
+    if rtsp_standby:
+        rtsp_standby.start()
     mqtt_bridge.start()
 
     log.add(f"Startup: idle (relay off + black), hostname={hostname}, mqtt_base={config.MQTT_BASE_TOPIC}")
 
 
+@app.on_event("shutdown")
+def shutdown():
+    mqtt_bridge.stop()
+    relay.close()
+    scheduler.stop()
+    input_reactor.stop()
+    display.close()
+    overlay.close()
+    if rtsp_standby:
+        rtsp_standby.stop()
+    if mpv:
+        mpv.close()
+
+
 # -------------------- API --------------------
 
 @app.get("/status")
-def status():
-    return {"ok": True, **state_provider()}
+def status(fresh: bool = False):
+    # ?fresh=1 erzwingt eine Hardware-Abfrage des Relais statt Shadow-State
+    return {"ok": True, **state_provider(fresh=fresh)}
 
 
 @app.get("/relay/status")
-def relay_status():
-    return {"relay": relay.status(), "relay_force_on": bool(getattr(relay, "force_on", False))}
+def relay_status(fresh: bool = False):
+    return {
+        "relay": relay.status(fresh=fresh),
+        "relay_force_on": relay.force_on,
+        **relay.drift_info(),
+    }
 
 
 @app.post("/relay/on")
@@ -564,7 +707,7 @@ def relay_on_permanent():
     log.add("API: relay/on (dauerhaft)")
     relay.on_permanent(on_start=overlay.hide)
     mqtt_bridge.publish_state_now()
-    return {"ok": True, "relay": relay.status(), "overlay_black": overlay.running(), "relay_force_on": bool(getattr(relay, "force_on", False))}
+    return {"ok": True, "relay": relay.status(), "overlay_black": overlay.running(), "relay_force_on": relay.force_on}
 
 
 @app.post("/relay/off")
@@ -574,7 +717,7 @@ def relay_off_now():
     relay.off()
     overlay.show()
     mqtt_bridge.publish_state_now()
-    return {"ok": True, "relay": relay.status(), "overlay_black": overlay.running(), "relay_force_on": bool(getattr(relay, "force_on", False))}
+    return {"ok": True, "relay": relay.status(), "overlay_black": overlay.running(), "relay_force_on": relay.force_on}
 
 
 @app.post("/relay")
@@ -588,7 +731,41 @@ def relay_switch(action: RelayAction):
     else:
         return {"error": "state must be 'on' or 'off'"}
     mqtt_bridge.publish_state_now()
-    return {"relay": relay.status(), "relay_force_on": bool(getattr(relay, "force_on", False))}
+    return {"relay": relay.status(), "relay_force_on": relay.force_on}
+
+
+@app.get("/relay/channels")
+def relay_channels():
+    return {"channels": relay.channel_states()}
+
+
+@app.post("/relay/channel/{channel}")
+def relay_channel_set(channel: str, action: RelayAction):
+    s = action.state.lower().strip()
+    if s not in ("on", "off"):
+        return {"ok": False, "error": "state must be 'on' or 'off'"}
+    try:
+        relay.set_channel(channel, s == "on")
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    mqtt_bridge.publish_state_now()
+    return {"ok": True, "channels": relay.channel_states()}
+
+
+@app.post("/relay/channels")
+def relay_channels_set(action: RelayChannelsAction):
+    states = {}
+    for ref, st in action.states.items():
+        st = st.lower().strip()
+        if st not in ("on", "off"):
+            return {"ok": False, "error": f"state for {ref} must be 'on' or 'off'"}
+        states[ref] = (st == "on")
+    try:
+        relay.set_channels(states)
+    except ValueError as e:
+        return {"ok": False, "error": str(e)}
+    mqtt_bridge.publish_state_now()
+    return {"ok": True, "channels": relay.channel_states()}
 
 
 @app.post("/touch/disable")
@@ -621,8 +798,12 @@ def touch_unlock():
 
 @app.post("/rtsp/start")
 def rtsp_start(req: RtspRequest):
-    log.add(f"API: rtsp/start {req.url} {req.seconds}s mode={req.mode}")
-    ok = rtsp.start(req.url, req.seconds, mode=req.mode)
+    if len(req.urls) > 1:
+        log.add(f"API: rtsp/start {req.layout} {req.urls} {req.seconds}s")
+        ok = rtsp.start_layout(req.urls, req.seconds, layout=req.layout, modes=req.modes or req.mode)
+    else:
+        log.add(f"API: rtsp/start {req.url} {req.seconds}s mode={req.mode}")
+        ok = rtsp.start(req.urls[0] if req.urls else req.url, req.seconds, mode=req.mode)
     mqtt_bridge.publish_state_now()
     return {"ok": ok, "rtsp": rtsp.info(), "mode": req.mode}
 
@@ -752,6 +933,7 @@ def rtsp_log():
 def ui():
     default_url = html.escape(config.RTSP_DEFAULT_URL)
     default_seconds = int(config.RTSP_DEFAULT_SECONDS)
+    screen = "{}x{}".format(*display.geometry())
     title = html.escape(hostname)
 
     return HTMLResponse(f"""
@@ -825,8 +1007,8 @@ def ui():
           <span class="label">Modus</span>
           <select id="rtspMode">
             <option value="normal">normal (1:1)</option>
-            <option value="crop">crop (Fill 1080x1920)</option>
-            <option value="stretch">stretch (1080x1920)</option>
+            <option value="crop">crop (Fill {screen})</option>
+            <option value="stretch">stretch ({screen})</option>
           </select>
 
           <span class="label">Sek.</span>
@@ -44,23 +44,56 @@ HA_DEVICE_NAME = HOSTNAME
 DEVICE_RELAY = _get_str("DEVICE_RELAY", "/dev/ttyUSB0")
 BAUDRATE = _get_int("BAUDRATE", 9600)
 RELAY_ON_TIME = _get_int("RELAY_ON_TIME", 300)
+RELAY_RECONNECT_INTERVAL = _get_int("RELAY_RECONNECT_INTERVAL", 2)  # Sekunden zwischen Reconnect-Versuchen
+RELAY_RECONCILE_INTERVAL = _get_int("RELAY_RECONCILE_INTERVAL", 60)  # Shadow-State vs. Hardware, 0 = aus
+RELAY_COALESCE_MS = _get_int("RELAY_COALESCE_MS", 5)  # Sammelfenster der Relay-Command-Queue
+
+# Mehrkanal-Boards (2/4/8): Kanal 1 ist immer das Backlight
+RELAY_CHANNELS = max(1, min(8, _get_int("RELAY_CHANNELS", 1)))
+_relay_names = [n.strip() for n in _get_str("RELAY_CHANNEL_NAMES", "backlight,panel,led,fan").split(",") if n.strip()]
+RELAY_CHANNEL_NAMES = [(_relay_names[i] if i < len(_relay_names) else f"ch{i + 1}") for i in range(RELAY_CHANNELS)]
 
 # ---------- Touch ----------
 TOUCH_DEVICE_PATH = _get_str("TOUCH_DEVICE_PATH", "/dev/input/touchscreen")
 UNLOCK_TOUCHES = _get_int("UNLOCK_TOUCHES", 10)
 UNLOCK_WINDOW = _get_int("UNLOCK_WINDOW", 10)
+# Unlock-Geste bei soft-disabled Touch: taps:N | corners:tl,tr,br,bl | longpress:S
+UNLOCK_PATTERN = _get_str("UNLOCK_PATTERN", "") or f"taps:{UNLOCK_TOUCHES}"
+TOUCH_REFIRE_MS = _get_int("TOUCH_REFIRE_MS", 2000)  # Callback-Wiederholung solange Finger liegt, 0 = nur touch-down
 
 # ---------- X11 / Display ----------
 DISPLAY = _get_str("DISPLAY", ":0")
 XAUTHORITY = _get_str("XAUTHORITY", "")
+# DPMS/Screensaver: auto (xlib wenn installiert) | xlib | xset
+DISPLAY_BACKEND = _get_str("DISPLAY_BACKEND", "auto").strip().lower()
+DISPLAY_WAKE_WINDOW_MS = _get_int("DISPLAY_WAKE_WINDOW_MS", 5000)  # weitere Wakes in diesem Fenster = No-op, 0 = aus
+# Bildschirmgröße "BxH" erzwingen; leer = per XRandR abfragen (Overlay, Crop, Snapshots)
+DISPLAY_GEOMETRY = _get_str("DISPLAY_GEOMETRY", "")
 
 # ---------- Overlay ----------
 BLACK_PNG_PATH = _get_str("BLACK_PNG_PATH", "/tmp/relay_black.png")
+# mpv (PNG in mpv, siehe MPV_IPC) | x11 (natives schwarzes Fenster, braucht python-xlib)
+OVERLAY_BACKEND = _get_str("OVERLAY_BACKEND", "mpv").strip().lower()
+
+# ---------- mpv ----------
+# ein langlebiger mpv für Overlay + RTSP (JSON IPC); 0 = alter Modus (ein Prozess pro Anzeige)
+MPV_IPC = _get_bool("MPV_IPC", True)
+MPV_IPC_SOCKET = _get_str("MPV_IPC_SOCKET", "/tmp/spiegel-mpv.sock")
 
 # ---------- RTSP ----------
 RTSP_DEFAULT_URL = _get_str("RTSP_DEFAULT_URL", "rtsp://192.168.10.36:8554/Eingang")
 RTSP_DEFAULT_SECONDS = _get_int("RTSP_DEFAULT_SECONDS", 300)
 RTSP_LOG_PATH = _get_str("RTSP_LOG_PATH", "/tmp/mpv_rtsp.log")
+# Watchdog: so lange ohne neue Frames = Hänger -> Reconnect (Backoff bis RTSP_RECONNECT_MAX_MS), 0 = aus
+RTSP_STALL_MS = _get_int("RTSP_STALL_MS", 4000)
+RTSP_RECONNECT_MAX_MS = _get_int("RTSP_RECONNECT_MAX_MS", 30000)
+# Quellgröße/Codec/fps pro URL (für den Crop-Filter) so lange merken
+RTSP_PROBE_TTL_SEC = _get_int("RTSP_PROBE_TTL_SEC", 3600)
+# Warm-Standby: zweiter mpv hält die Session zu RTSP_DEFAULT_URL offen (nur mit MPV_IPC)
+RTSP_STANDBY = _get_bool("RTSP_STANDBY", False)
+RTSP_STANDBY_MAX_TEMP_C = _get_int("RTSP_STANDBY_MAX_TEMP_C", 75)   # darüber Standby aus
+RTSP_STANDBY_MAX_LOAD_PCT = _get_int("RTSP_STANDBY_MAX_LOAD_PCT", 80)  # load1 / CPU-Kerne in %
+RTSP_STANDBY_SOCKET = _get_str("RTSP_STANDBY_SOCKET", "/tmp/spiegel-mpv-standby.sock")
 
 # ---------- MQTT ----------
 MQTT_ENABLED = _get_bool("MQTT_ENABLED", True)
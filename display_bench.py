@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Benchmark Display-Wake: xset-Prozesse vs. persistente X11-Verbindung (xlib).
+
+Pro Wake werden DPMS on + Screensaver reset ausgeführt, genau wie
+DisplayController.wake(). Mit --xvfb wird ein eigener Xvfb gestartet
+(apt install xvfb), läuft also ohne echtes Display / auf CI:
+
+  python display_bench.py --xvfb -n 200
+  python display_bench.py --display :0 -n 50
+
+Nach jedem Backend wird der DPMS-Zustand per xlib geprüft (muss "on" sein).
+Mit --min-speedup wird der Exit-Code != 0, wenn xlib nicht mindestens um
+diesen Faktor schneller ist (p50).
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from display_ctl import DisplayController, XlibDpms
+
+
+class _QuietLog:
+    def add(self, msg: str):
+        pass
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _summary(name, samples_s):
+    ms = [x * 1000.0 for x in samples_s]
+    return {
+        "name": name,
+        "n": len(ms),
+        "mean_ms": round(statistics.mean(ms), 3) if ms else 0.0,
+        "p50_ms": round(_pct(ms, 0.50), 3),
+        "p95_ms": round(_pct(ms, 0.95), 3),
+        "p99_ms": round(_pct(ms, 0.99), 3),
+    }
+
+
+def start_xvfb(display: str):
+    if not shutil.which("Xvfb"):
+        raise SystemExit("Xvfb fehlt (apt install xvfb)")
+    proc = subprocess.Popen(["Xvfb", display, "-screen", "0", "1080x1920x24", "-nolisten", "tcp"],
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    sock = f"/tmp/.X11-unix/X{display.lstrip(':').split('.')[0]}"
+    for _ in range(100):
+        if os.path.exists(sock):
+            return proc
+        if proc.poll() is not None:
+            break
+        time.sleep(0.05)
+    proc.kill()
+    raise SystemExit(f"Xvfb {display} startet nicht")
+
+
+def bench_backend(display: str, backend: str, n: int):
+    ctl = DisplayController(display_default=display, log=_QuietLog(), backend=backend)
+    try:
+        ctl.wake()  # Verbindung / env aufwärmen
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            ctl.wake()
+            samples.append(time.perf_counter() - t0)
+        return samples, ctl.info()
+    finally:
+        ctl.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Display-Wake Benchmark (xset vs. xlib)")
+    ap.add_argument("--display", default=os.environ.get("DISPLAY", ":0"))
+    ap.add_argument("--xvfb", action="store_true", help="eigenen Xvfb starten (--display wird :99)")
+    ap.add_argument("-n", type=int, default=100, help="Anzahl Wakes pro Backend")
+    ap.add_argument("--min-speedup", type=float, default=0.0, help="p50 xset / p50 xlib Schwelle")
+    args = ap.parse_args()
+
+    xvfb = None
+    display = args.display
+    if args.xvfb:
+        display = ":99"
+        xvfb = start_xvfb(display)
+    # DisplayController bevorzugt $DISPLAY vor display_default
+    os.environ["DISPLAY"] = display
+
+    results = []
+    p50 = {}
+    failed = False
+    try:
+        for backend in ("xset", "xlib"):
+            if backend == "xlib" and not XlibDpms.available():
+                print("xlib: python-xlib fehlt (pip install python-xlib) -> übersprungen")
+                continue
+            if backend == "xset" and not shutil.which("xset"):
+                print("xset: fehlt (apt install x11-xserver-utils) -> übersprungen")
+                continue
+            samples, info = bench_backend(display, backend, args.n)
+            if info["backend"] != backend or info["xlib_errors"]:
+                # Messung lief (teilweise) über den Fallback -> nicht vergleichbar
+                print(f"FAIL {backend}: {info}")
+                failed = True
+            r = _summary(backend, samples)
+            results.append(r)
+            p50[backend] = r["p50_ms"]
+
+        if XlibDpms.available():
+            ctl = DisplayController(display_default=display, log=_QuietLog(), backend="xlib")
+            try:
+                print(f"DPMS danach: {ctl.dpms_level()}")
+            finally:
+                ctl.close()
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait(timeout=5)
+
+    for r in results:
+        print(f"{r['name']:<6} n={r['n']:<5} mean={r['mean_ms']:>9.3f}ms "
+              f"p50={r['p50_ms']:>9.3f}ms p95={r['p95_ms']:>9.3f}ms p99={r['p99_ms']:>9.3f}ms")
+
+    speedup = 0.0
+    if p50.get("xset") and p50.get("xlib"):
+        speedup = p50["xset"] / max(p50["xlib"], 1e-6)
+        print(f"xlib ist {speedup:.1f}x schneller (p50)")
+
+    if args.min_speedup and speedup < args.min_speedup:
+        print(f"FAIL: Speedup {speedup:.1f}x < {args.min_speedup}x")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,264 @@
 import os
+import re
+import time
 import subprocess
 import getpass
+import threading
+from types import MappingProxyType
+
+try:
+    # optional: persistente X11-Verbindung statt xset-Prozesse
+    from Xlib import X
+    from Xlib import display as xdisplay
+    from Xlib.ext import dpms as xdpms
+    from Xlib.ext import randr as xrandr
+
+    _DPMS_LEVELS = {
+        xdpms.DPMSModeOn: "on",
+        xdpms.DPMSModeStandby: "standby",
+        xdpms.DPMSModeSuspend: "suspend",
+        xdpms.DPMSModeOff: "off",
+    }
+except ImportError:
+    xdisplay = None
+    _DPMS_LEVELS = {}
+
+from inotify import (
+    Inotify, IN_ATTRIB, IN_CLOSE_WRITE, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_IGNORED, IN_ONLYDIR,
+)
+
+# Xauthority wird vom Display-Manager meist neu geschrieben bzw. per rename ersetzt
+_XA_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_CLOSE_WRITE | IN_ATTRIB
+
+# ohne inotify-Watch (Verzeichnis fehlt noch, z. B. vor dem Login) wird spätestens so oft neu gesucht
+_ENV_RETRY = 5.0
+
+# Spiegel-Panel hochkant; nur wenn weder XRandR noch `xrandr` eine Antwort liefern
+DEFAULT_GEOMETRY = (1080, 1920)
+
+# xlib_connect() setzt XAUTHORITY kurz in os.environ; alle Zugriffe darauf
+# (Verbindungsaufbau aus mehreren Threads, _build_env) laufen unter diesem Lock
+_XAUTH_LOCK = threading.RLock()
+
+
+def xlib_connect(env):
+    """Xlib-Verbindung mit DISPLAY/XAUTHORITY aus env (DisplayController.env())."""
+    # python-xlib liest die Xauthority nur aus os.environ
+    xa = env.get("XAUTHORITY", "")
+    with _XAUTH_LOCK:
+        saved = os.environ.get("XAUTHORITY")
+        try:
+            if xa:
+                os.environ["XAUTHORITY"] = xa
+            return xdisplay.Display(env.get("DISPLAY"))
+        finally:
+            if saved is None:
+                os.environ.pop("XAUTHORITY", None)
+            else:
+                os.environ["XAUTHORITY"] = saved
+
+
+def parse_geometry(value: str):
+    """ "1080x1920" -> (1080, 1920), sonst None."""
+    m = re.fullmatch(r"\s*(\d+)\s*[xX×]\s*(\d+)\s*", value or "")
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+def _randr_geometry(env):
+    # CRTC des primären (sonst ersten aktiven) Ausgangs; Größe ist schon rotiert
+    d = xlib_connect(env)
+    try:
+        screen = d.screen()
+        if d.has_extension("RANDR"):
+            root = screen.root
+            # _current: ohne Hardware-Abfrage der Ausgänge (kann sonst flackern)
+            res = root.xrandr_get_screen_resources_current()
+            primary = root.xrandr_get_output_primary().output
+            outputs = list(res.outputs)
+            if primary in outputs:
+                outputs.remove(primary)
+                outputs.insert(0, primary)
+            for out in outputs:
+                oi = d.xrandr_get_output_info(out, res.config_timestamp)
+                if not oi.crtc:
+                    continue
+                ci = d.xrandr_get_crtc_info(oi.crtc, res.config_timestamp)
+                if ci.width and ci.height:
+                    return (ci.width, ci.height), "randr"
+        return (screen.width_in_pixels, screen.height_in_pixels), "x11"
+    finally:
+        d.close()
+
+
+def _xrandr_cli_geometry(env):
+    out = subprocess.run(["xrandr", "--current"], env=env, capture_output=True, text=True, timeout=3).stdout
+    m = (re.search(r" connected primary (\d+)x(\d+)\+", out)
+         or re.search(r" connected (\d+)x(\d+)\+", out)
+         or re.search(r"current (\d+) x (\d+)", out))
+    return ((int(m.group(1)), int(m.group(2))), "xrandr") if m else None
+
+
+def query_geometry(env):
+    """((breite, höhe), quelle) des Hauptausgangs: XRandR per xlib, sonst `xrandr`; None wenn beides fehlt."""
+    if xdisplay is not None:
+        try:
+            return _randr_geometry(env)
+        except Exception:
+            pass
+    try:
+        return _xrandr_cli_geometry(env)
+    except Exception:
+        return None
+
+
+class XProtocolError(RuntimeError):
+    """X-Server hat einen Request abgelehnt (BadMatch, BadValue ...)."""
+
+
+class XlibDpms:
+    """
+    DPMS/Screensaver über eine dauerhaft offene X11-Verbindung (python-xlib):
+    DPMSForceLevel(On) + ResetScreenSaver ohne fork/exec pro Wake.
+    Bei Verbindungsfehler (X-Server neu gestartet ...) wird einmal neu verbunden.
+    """
+
+    def __init__(self, env_fn, log=None):
+        self._env_fn = env_fn
+        self.log = log
+        self._lock = threading.Lock()
+        self._d = None
+        self._env = None
+        self._errors = []   # X-Protokollfehler (BadMatch ...) seit dem letzten _call
+        self.connects = 0
+
+    @staticmethod
+    def available() -> bool:
+        return xdisplay is not None
+
+    def _on_error(self, err, request=None):
+        # Standard-Handler von python-xlib druckt Fehler nur aus -> sammeln, _check() wirft
+        self._errors.append(err)
+
+    def _check(self):
+        if self._errors:
+            err, self._errors = self._errors[0], []
+            raise XProtocolError(str(err))
+
+    def _connect(self):
+        env = self._env_fn()
+        # neue env (Xauthority geändert) -> neu verbinden
+        if self._d is not None and env is self._env:
+            return self._d
+        self._close()
+
+        d = xlib_connect(env)
+        if not d.has_extension("DPMS"):
+            d.close()
+            raise RuntimeError("X-Server ohne DPMS-Extension")
+        d.set_error_handler(self._on_error)
+        self._d = d
+        self._env = env
+        self.connects += 1
+        if self.log:
+            self.log.add(f"Display: X11-Verbindung {env.get('DISPLAY')} offen (xlib)")
+        return d
+
+    def _close(self):
+        if self._d is not None:
+            try:
+                self._d.close()
+            except Exception:
+                pass
+        self._d = None
+        self._env = None
+
+    def _call(self, fn):
+        with self._lock:
+            self._errors = []
+            try:
+                return fn(self._connect())
+            except XProtocolError:
+                # Request abgelehnt, Verbindung ist in Ordnung
+                raise
+            except Exception:
+                # Verbindung weg -> einmal neu verbinden
+                self._close()
+                return fn(self._connect())
+
+    def wake(self):
+        def _wake(d):
+            # wie `xset dpms force on`: DPMS ggf. erst einschalten, sonst BadMatch
+            if not d.dpms_info().state:
+                d.dpms_enable()
+            d.dpms_force_level(xdpms.DPMSModeOn)
+            d.force_screen_saver(X.ScreenSaverReset)
+            d.sync()  # Round-Trip: Fehler der Requests ohne Antwort kommen spätestens hier an
+            self._check()
+        self._call(_wake)
+
+    def power_level(self) -> str:
+        """on | standby | suspend | off | disabled"""
+        def _level(d):
+            info = d.dpms_info()
+            if not info.state:
+                return "disabled"
+            return _DPMS_LEVELS.get(info.power_level, str(info.power_level))
+        return self._call(_level)
+
+    def close(self):
+        with self._lock:
+            self._close()
+
 
 class DisplayController:
-    def __init__(self, display_default=":0", xauthority_env="", log=None):
+    def __init__(self, display_default=":0", xauthority_env="", log=None, backend: str = "auto",
+                 wake_window: float = 0.0, geometry=None):
         self.display_default = display_default
         self.xauthority_env = xauthority_env
         self.log = log
 
-    def _find_xauthority(self) -> str:
-        xa = os.environ.get("XAUTHORITY", "")
-        if xa and os.path.exists(xa):
-            return xa
+        # Wake-Unterdrückung: innerhalb wake_window Sekunden nach einem Wake ist
+        # ein weiterer (nicht erzwungener) Wake ein No-op, solange DPMS "on" ist
+        self.wake_window = wake_window
+        self._wake_lock = threading.Lock()
+        self._last_wake = None        # monotonic
+        self.dpms_state = "unknown"   # on/standby/suspend/off/disabled/unknown
+        self.wakes_requested = 0
+        self.wakes_performed = 0
 
+        # auto | xlib | xset – xset bleibt immer Fallback
+        self.backend = "xset"
+        self._xlib = None
+        self.xlib_errors = 0
+        if backend in ("auto", "xlib"):
+            if XlibDpms.available():
+                self._xlib = XlibDpms(self.env, log)
+                self.backend = "xlib"
+            elif backend == "xlib" and log:
+                log.add("Display: python-xlib fehlt (pip install python-xlib), nutze xset")
+
+        # env() Cache: unveränderliches Mapping, invalidiert per inotify auf die Xauthority
+        self._env_lock = threading.Lock()
+        self._env = None
+        self._env_ts = 0.0
+        self._inotify = None
+        self._xa_watches = {}   # wd -> {Dateinamen}
+        self.env_builds = 0
+
+        # Bildschirmgröße: einmal abfragen, per RandR-Event (ScreenChangeNotify) neu
+        self._geo_lock = threading.Lock()
+        self._geo_override = geometry   # (w, h) aus der Konfiguration, ersetzt die Abfrage
+        self._geometry = None
+        self.geometry_source = None
+        self._geo_retry = 0.0             # nächste Abfrage, solange nur DEFAULT_GEOMETRY bekannt ist
+        self.geometry_queries = 0
+        self._geo_listeners = []
+        self._randr = None              # eigene X-Verbindung nur für RandR-Events
+        self._reactor = None
+        self._randr_retry = 0.0
+        self.randr_events = 0
+
+    def _xauthority_candidates(self):
         candidates = []
         sudo_user = os.environ.get("SUDO_USER")
         if sudo_user:
@@ -22,28 +268,228 @@ class DisplayController:
         candidates.append("/home/conrad/.Xauthority")
         candidates.append("/run/user/1000/gdm/Xauthority")
         candidates.append("/run/user/1000/.Xauthority")
+        return candidates
+
+    def _find_xauthority(self) -> str:
+        xa = os.environ.get("XAUTHORITY", "")
+        if xa and os.path.exists(xa):
+            return xa
 
-        for p in candidates:
+        for p in self._xauthority_candidates():
             if os.path.exists(p):
                 return p
         return ""
 
-    def env(self):
-        env = os.environ.copy()
-        env["DISPLAY"] = os.environ.get("DISPLAY", self.display_default)
-
-        xa = os.environ.get("XAUTHORITY", "") or self.xauthority_env or self._find_xauthority()
+    def _build_env(self):
+        with _XAUTH_LOCK:
+            env = os.environ.copy()
+            env["DISPLAY"] = os.environ.get("DISPLAY", self.display_default)
+            xa = os.environ.get("XAUTHORITY", "") or self.xauthority_env or self._find_xauthority()
         if xa:
             env["XAUTHORITY"] = xa
 
-        return env
+        self.env_builds += 1
+        self._watch_xauthority(xa)
+        return MappingProxyType(env)
 
-    def wake(self):
-        """Best-effort Wake via xset (X11)."""
+    def _watch_xauthority(self, xa: str):
+        """Watches auf die Verzeichnisse der Xauthority (bzw. aller Kandidaten, solange keine gefunden ist)."""
+        if self._inotify is None:
+            try:
+                self._inotify = Inotify()
+            except OSError as e:
+                if self.log:
+                    self.log.add(f"Display: inotify nicht verfügbar ({e}), env() Cache mit Timeout")
+                self._inotify = False
+        if not self._inotify:
+            return
+
+        for wd in self._xa_watches:
+            self._inotify.rm_watch(wd)
+        self._xa_watches = {}
+        self._inotify.read()  # Events der alten Watches verwerfen
+
+        for p in ([xa] if xa else self._xauthority_candidates()):
+            try:
+                wd = self._inotify.add_watch(os.path.dirname(p) or ".", _XA_MASK | IN_ONLYDIR)
+            except OSError:
+                continue
+            self._xa_watches.setdefault(wd, set()).add(os.path.basename(p))
+
+    def _env_stale(self) -> bool:
+        if not self._inotify or not self._xa_watches:
+            return time.monotonic() - self._env_ts >= _ENV_RETRY
+        stale = False
+        for wd, mask, name in self._inotify.read():
+            if mask & IN_IGNORED or name in self._xa_watches.get(wd, ()):
+                stale = True
+        return stale
+
+    def invalidate_env(self):
+        with self._env_lock:
+            self._env = None
+
+    def env(self):
+        """DISPLAY/XAUTHORITY-Umgebung für X11-Prozesse (gecacht, nicht veränderbar)."""
+        with self._env_lock:
+            if self._env is None or self._env_stale():
+                old = self._env
+                self._env = self._build_env()
+                self._env_ts = time.monotonic()
+                if old is not None and self.log and old.get("XAUTHORITY") != self._env.get("XAUTHORITY"):
+                    self.log.add(f"Display: XAUTHORITY jetzt {self._env.get('XAUTHORITY', '')!r}")
+            return self._env
+
+    # ---------- Geometrie ----------
+
+    def geometry(self):
+        """(breite, höhe) des Bildschirms in Pixeln (gecacht)."""
+        with self._geo_lock:
+            if self._geometry is None:
+                self._query_geometry()
+            geo = self._geometry
+            # Notlösung DEFAULT_GEOMETRY (X noch nicht oben) nicht behalten: neu abfragen
+            retry = self.geometry_source == "default" and time.monotonic() >= self._geo_retry
+        if retry and self.refresh_geometry():
+            geo = self._geometry
+        if self._reactor is not None and self._randr is None and time.monotonic() >= self._randr_retry:
+            # RandR-Verbindung verloren (X-Server neu gestartet) -> neu anmelden
+            self.watch_geometry(self._reactor)
+        return geo
+
+    def _query_geometry(self):
+        # unter self._geo_lock
+        self.geometry_queries += 1
+        if self._geo_override:
+            self._geometry, self.geometry_source = tuple(self._geo_override), "config"
+            return
+        res = query_geometry(self.env())
+        if res is None:
+            if self.log and self.geometry_source != "default":
+                self.log.add(f"Display: Bildschirmgröße unbekannt, nehme {DEFAULT_GEOMETRY[0]}x{DEFAULT_GEOMETRY[1]}")
+            self._geometry, self.geometry_source = DEFAULT_GEOMETRY, "default"
+            self._geo_retry = time.monotonic() + _ENV_RETRY
+            return
+        self._geometry, self.geometry_source = res
+        if self.log:
+            self.log.add(f"Display: {self._geometry[0]}x{self._geometry[1]} ({self.geometry_source})")
+
+    def on_geometry_change(self, callback):
+        """callback((breite, höhe)) nach einer Größenänderung (Reactor-Thread)."""
+        self._geo_listeners.append(callback)
+
+    def refresh_geometry(self) -> bool:
+        """Neu abfragen; True und Listener-Aufruf wenn sich die Größe geändert hat."""
+        with self._geo_lock:
+            old = self._geometry
+            self._query_geometry()
+            new = self._geometry
+        if new == old:
+            return False
+        for cb in list(self._geo_listeners):
+            try:
+                cb(new)
+            except Exception as e:
+                if self.log:
+                    self.log.add(f"Display: Geometrie-Listener Fehler: {e}")
+        return True
+
+    def watch_geometry(self, reactor) -> bool:
+        """RandR ScreenChangeNotify über den InputReactor (kein eigener Thread). False ohne xlib/RandR."""
+        if xdisplay is None or self._geo_override:
+            return False
+        self._reactor = reactor
+        self._randr_retry = time.monotonic() + _ENV_RETRY
+        try:
+            d = xlib_connect(self.env())
+            if not d.has_extension("RANDR"):
+                d.close()
+                return False
+            d.screen().root.xrandr_select_input(xrandr.RRScreenChangeNotifyMask)
+            d.flush()
+        except Exception as e:
+            if self.log:
+                self.log.add(f"Display: RandR-Events nicht verfügbar ({e})")
+            return False
+        self._randr = d
+        reactor.add_fd(d.fileno(), self._on_randr)
+        # X ist (wieder) erreichbar: Größe neu abfragen, Änderungen verpasst bzw. bisher nur Default
+        self.refresh_geometry()
+        return True
+
+    def _on_randr(self):
+        d = self._randr
+        if d is None:
+            return
+        fd = d.fileno()
+        try:
+            n = d.pending_events()
+            for _ in range(n):
+                d.next_event()
+            self.randr_events += n
+        except Exception:
+            # Verbindung weg: abmelden, nächster geometry()-Aufruf fragt neu und meldet sich wieder an
+            self._reactor.remove(fd)
+            self._randr = None
+            try:
+                d.close()
+            except Exception:
+                pass
+            with self._geo_lock:
+                self._geometry = None
+            return
+        if n and self.refresh_geometry() and self.log:
+            w, h = self._geometry
+            self.log.add(f"Display: RandR-Änderung -> {w}x{h}")
+
+    def wake(self, force: bool = False) -> bool:
+        """
+        Best-effort Wake: DPMS on + Screensaver reset (xlib, Fallback xset).
+        Innerhalb wake_window nach dem letzten Wake ein No-op (außer force=True
+        oder DPMS ist laut X-Server nicht mehr "on"). True wenn geweckt wurde.
+        """
+        with self._wake_lock:
+            self.wakes_requested += 1
+            if not force and self._suppress():
+                return False
+
+            if not self._wake_xlib():
+                self._wake_xset()
+            self._last_wake = time.monotonic()
+            self.dpms_state = "on"
+            self.wakes_performed += 1
+            return True
+
+    def _suppress(self) -> bool:
+        if self._last_wake is None or time.monotonic() - self._last_wake >= self.wake_window:
+            return False
+        if self._xlib is not None:
+            # jemand anderes (xset dpms force off, Timeout) kann das Display abgeschaltet haben
+            level = self.dpms_level()
+            if level is not None:
+                self.dpms_state = level
+        return self.dpms_state == "on"
+
+    def _wake_xlib(self) -> bool:
+        if self._xlib is None:
+            return False
+        try:
+            self._xlib.wake()
+            if self.log:
+                self.log.add("Display: wake (xlib dpms on + s reset)")
+            return True
+        except Exception as e:
+            self.xlib_errors += 1
+            if self.log:
+                self.log.add(f"Display: xlib Fehler ({e}), Fallback xset")
+            return False
+
+    def _wake_xset(self):
         try:
-            subprocess.run(["xset", "dpms", "force", "on"], env=self.env(),
+            env = self.env()
+            subprocess.run(["xset", "dpms", "force", "on"], env=env,
                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
-            subprocess.run(["xset", "s", "reset"], env=self.env(),
+            subprocess.run(["xset", "s", "reset"], env=env,
                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
             if self.log:
                 self.log.add("Display: wake (xset dpms on + s reset)")
@@ -54,3 +500,40 @@ class DisplayController:
             if self.log:
                 self.log.add(f"Display: wake Fehler: {e}")
 
+    def dpms_level(self):
+        """DPMS-Zustand (on/standby/suspend/off/disabled), None ohne xlib."""
+        if self._xlib is None:
+            return None
+        try:
+            return self._xlib.power_level()
+        except Exception:
+            return None
+
+    def info(self):
+        return {
+            "backend": self.backend,
+            "dpms": self.dpms_state,
+            "wake_window": self.wake_window,
+            "wakes_requested": self.wakes_requested,
+            "wakes_performed": self.wakes_performed,
+            "last_wake_ago": round(time.monotonic() - self._last_wake, 1) if self._last_wake is not None else None,
+            "xlib_connects": self._xlib.connects if self._xlib else 0,
+            "xlib_errors": self.xlib_errors,
+            "env_builds": self.env_builds,
+            "geometry": f"{self._geometry[0]}x{self._geometry[1]}" if self._geometry else None,
+            "geometry_source": self.geometry_source,
+            "geometry_queries": self.geometry_queries,
+            "randr_events": self.randr_events,
+        }
+
+    def close(self):
+        if self._xlib is not None:
+            self._xlib.close()
+        d, self._randr = self._randr, None
+        if d is not None:
+            if self._reactor is not None:
+                self._reactor.remove(d.fileno())
+            try:
+                d.close()
+            except Exception:
+                pass
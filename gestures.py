@@ -0,0 +1,156 @@
+"""
+Unlock-Gesten für den Touchscreen (nur aktiv wenn Touch soft-disabled ist).
+
+Muster (UNLOCK_PATTERN):
+  taps:N                 N Taps innerhalb UNLOCK_WINDOW Sekunden
+  corners:tl,tr,br,bl    Taps in dieser Ecken-Reihenfolge innerhalb UNLOCK_WINDOW
+  longpress:S            Finger S Sekunden liegen lassen
+
+Die letzten Taps liegen in einem Ringpuffer mit fester Größe (vorallokierte
+Listen, keine Allokation pro Event). Jede Prüfung ist O(1) bzw. O(Musterlänge).
+Koordinaten sind Geräte-Koordinaten (Ecken beziehen sich auf den Touch-Controller).
+"""
+
+CORNER_NONE = 0
+CORNERS = {"tl": 1, "tr": 2, "bl": 3, "br": 4}
+
+
+def parse_pattern(spec: str):
+    """'taps:10' -> ("taps", 10); 'corners:tl,br' -> ("corners", (1, 4)); 'longpress:3' -> ("longpress", 3.0)"""
+    kind, _, arg = (spec or "").strip().lower().partition(":")
+    if kind == "taps":
+        n = int(arg)
+        if n < 1:
+            raise ValueError("taps: N muss >= 1 sein")
+        return kind, n
+    if kind == "corners":
+        names = [c.strip() for c in arg.split(",") if c.strip()]
+        unknown = [c for c in names if c not in CORNERS]
+        if unknown:
+            raise ValueError(f"corners: unbekannte Ecke {', '.join(unknown)} (tl,tr,bl,br)")
+        seq = tuple(CORNERS[c] for c in names)
+        if not seq:
+            raise ValueError("corners: mindestens eine Ecke (tl,tr,bl,br)")
+        return kind, seq
+    if kind == "longpress":
+        sec = float(arg)
+        if sec <= 0:
+            raise ValueError("longpress: Sekunden müssen > 0 sein")
+        return kind, sec
+    raise ValueError(f"unbekanntes Unlock-Muster: {spec!r}")
+
+
+class UnlockDetector:
+    def __init__(self, pattern: str, window: float, size: int = 16):
+        self.kind, self.arg = parse_pattern(pattern)
+        self.pattern = pattern
+        self.window = window
+
+        need = self.arg if self.kind == "taps" else len(self.arg) if self.kind == "corners" else 1
+        self.size = max(size, need)
+
+        # Ringpuffer: Zeit, Position, Ecke je Tap
+        self._t = [0.0] * self.size
+        self._x = [0] * self.size
+        self._y = [0] * self.size
+        self._corner = [CORNER_NONE] * self.size
+        self._head = 0       # nächster Schreibindex
+        self._count = 0
+
+        self._down_t = None  # Beginn des aktuellen Touches (longpress)
+
+        # Achsen (min, max) für die Ecken-Erkennung
+        self._x_min, self._x_max = 0, 1
+        self._y_min, self._y_max = 0, 1
+
+    def set_axes(self, x_min: int, x_max: int, y_min: int, y_max: int):
+        self._x_min, self._x_max = x_min, max(x_max, x_min + 1)
+        self._y_min, self._y_max = y_min, max(y_max, y_min + 1)
+
+    def reset(self):
+        self._count = 0
+        self._down_t = None
+
+    def progress(self) -> str:
+        """Taps im Fenster des neuesten Taps, z. B. "3/10" (für das Log)."""
+        if self.kind == "longpress":
+            return "hold"
+        need = self.arg if self.kind == "taps" else len(self.arg)
+        n = 0
+        if self._count:
+            newest = self._t[self._at(0)]
+            while n < min(self._count, need) and newest - self._t[self._at(n)] <= self.window:
+                n += 1
+        return f"{n}/{need}"
+
+    def _corner_of(self, x: int, y: int) -> int:
+        fx = (x - self._x_min) * 3
+        fy = (y - self._y_min) * 3
+        w = self._x_max - self._x_min
+        h = self._y_max - self._y_min
+        left, right = fx < w, fx >= 2 * w
+        top, bottom = fy < h, fy >= 2 * h
+        if top and left:
+            return CORNERS["tl"]
+        if top and right:
+            return CORNERS["tr"]
+        if bottom and left:
+            return CORNERS["bl"]
+        if bottom and right:
+            return CORNERS["br"]
+        return CORNER_NONE
+
+    def _at(self, back: int) -> int:
+        # Index des `back`-letzten Eintrags (0 = neuester)
+        return (self._head - 1 - back) % self.size
+
+    def on_down(self, t: float, x: int, y: int) -> bool:
+        """Touch-down; True wenn das Muster damit erfüllt ist."""
+        self._down_t = t
+        if self.kind == "longpress":
+            return False
+
+        i = self._head
+        self._t[i] = t
+        self._x[i] = x
+        self._y[i] = y
+        self._corner[i] = self._corner_of(x, y)
+        self._head = (i + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+        if self.kind == "taps":
+            n = self.arg
+            if self._count < n:
+                return False
+            if t - self._t[self._at(n - 1)] > self.window:
+                return False
+            self.reset()
+            return True
+
+        # corners: die letzten len(seq) Taps müssen exakt der Sequenz entsprechen
+        seq = self.arg
+        n = len(seq)
+        if self._count < n or t - self._t[self._at(n - 1)] > self.window:
+            return False
+        for k in range(n):
+            if self._corner[self._at(n - 1 - k)] != seq[k]:
+                return False
+        self.reset()
+        return True
+
+    def hold_time(self):
+        """Sekunden ab touch-down bis longpress erfüllt ist (None bei anderen Mustern)."""
+        return self.arg if self.kind == "longpress" else None
+
+    def on_hold(self, t: float) -> bool:
+        """Finger liegt noch (pro Frame bzw. Deadline); True wenn longpress erreicht."""
+        if self.kind != "longpress" or self._down_t is None:
+            return False
+        if t - self._down_t >= self.arg:
+            self._down_t = None
+            return True
+        return False
+
+    def on_up(self, t: float):
+        self._down_t = None
@@ -0,0 +1,233 @@
+import os
+import errno
+import selectors
+import threading
+
+from inotify import (
+    Inotify, IN_ATTRIB, IN_CREATE, IN_DELETE, IN_MOVED_FROM, IN_MOVED_TO, IN_IGNORED, IN_ONLYDIR,
+)
+
+# Hotplug: neue/entfernte Device-Nodes und udev-Symlinks (werden per rename angelegt)
+HOTPLUG_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB
+
+
+class InputReactor:
+    """
+    Ein Thread für alle Input-Devices (Touchscreen, Tastaturen, Fernbedienung ...).
+
+    Multiplexed alle evdev-fds über selectors (epoll unter Linux) und liest pro
+    Wakeup alle anstehenden Events eines Devices mit einem read() (dev.read()
+    statt read_loop()-Generator pro Event). Handler laufen auf dem Reactor-Thread.
+
+    add()/remove()/call() sind aus beliebigen Threads erlaubt: Änderungen werden
+    über eine Queue + Wake-Pipe an den Reactor-Thread übergeben.
+
+    watch_dir() meldet Hotplug in /dev/input bzw. /dev/input/by-id (inotify,
+    läuft ebenfalls über den Reactor-Thread).
+    """
+
+    def __init__(self, log):
+        self.log = log
+
+        self._sel = selectors.DefaultSelector()
+        self._ops = []
+        self._ops_lock = threading.Lock()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+
+        self._inotify = None
+        self._watches = {}   # wd -> [callback(name, mask)]
+
+        self._thread = None
+        self._stop = False
+
+        self.wakeups = 0
+        self.batches = 0
+        self.events = 0
+
+    # ---------- Registrierung ----------
+
+    def add(self, dev, handler, on_error=None):
+        """
+        dev: evdev.InputDevice
+        handler(dev, events): Liste aller beim Wakeup gelesenen Events
+        on_error(dev, exc): Device ist weg (ENODEV ...) und wurde bereits entfernt
+        """
+        self._submit(("add_dev", dev, handler, on_error))
+
+    def add_fd(self, fd: int, callback):
+        """Beliebiger fd (z. B. inotify): callback() wenn lesbar."""
+        self._submit(("add_fd", fd, callback, None))
+
+    def watch_dir(self, path: str, callback) -> bool:
+        """
+        callback(name, mask) bei Änderungen in path (auf dem Reactor-Thread).
+        False wenn path (noch) nicht existiert.
+        """
+        with self._ops_lock:
+            if self._inotify is None:
+                self._inotify = Inotify()
+                created = True
+            else:
+                created = False
+        if created:
+            self.add_fd(self._inotify.fileno(), self._on_inotify)
+
+        try:
+            wd = self._inotify.add_watch(path, HOTPLUG_MASK | IN_ONLYDIR)
+        except OSError:
+            return False
+        with self._ops_lock:
+            cbs = self._watches.setdefault(wd, [])
+            if callback not in cbs:
+                cbs.append(callback)
+        return True
+
+    def _on_inotify(self):
+        for wd, mask, name in self._inotify.read():
+            with self._ops_lock:
+                if mask & IN_IGNORED:
+                    # Verzeichnis gelöscht -> Watch ist weg
+                    self._watches.pop(wd, None)
+                    continue
+                cbs = list(self._watches.get(wd, ()))
+            for cb in cbs:
+                try:
+                    cb(name, mask)
+                except Exception as e:
+                    self.log.add(f"Input: Hotplug-Handler Fehler: {e}")
+
+    def call(self, fn):
+        """fn() auf dem Reactor-Thread ausführen (z. B. aus Scheduler-Deadlines)."""
+        self._submit(("call", fn, None, None))
+
+    def remove(self, dev_or_fd, close: bool = False):
+        """Abmelden; close=True schließt das Device danach (auf dem Reactor-Thread)."""
+        self._submit(("remove", dev_or_fd, close, None))
+
+    def _submit(self, op):
+        with self._ops_lock:
+            self._ops.append(op)
+        try:
+            os.write(self._wake_w, b"\0")
+        except BlockingIOError:
+            pass
+
+    def _apply_ops(self):
+        with self._ops_lock:
+            ops, self._ops = self._ops, []
+        for kind, obj, cb, on_error in ops:
+            if kind == "noop":
+                continue
+            if kind == "call":
+                try:
+                    obj()
+                except Exception as e:
+                    self.log.add(f"Input: call Fehler: {e}")
+                continue
+            if kind == "remove":
+                fd = obj if isinstance(obj, int) else obj.fd
+                try:
+                    self._sel.unregister(fd)
+                except (KeyError, ValueError):
+                    pass
+                if cb and not isinstance(obj, int):
+                    try:
+                        obj.close()
+                    except Exception:
+                        pass
+                continue
+            fd = obj if kind == "add_fd" else obj.fd
+            try:
+                self._sel.unregister(fd)
+            except (KeyError, ValueError):
+                pass
+            self._sel.register(fd, selectors.EVENT_READ, (kind, obj, cb, on_error))
+
+    # ---------- Loop ----------
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop = True
+        self._submit(("noop", -1, None, None))
+
+    def device_count(self) -> int:
+        return sum(1 for k in self._sel.get_map().values() if k.data and k.data[0] == "add_dev")
+
+    def info(self):
+        return {
+            "devices": self.device_count(),
+            "wakeups": self.wakeups,
+            "batches": self.batches,
+            "events": self.events,
+        }
+
+    def _drop(self, key, exc):
+        _, dev, _, on_error = key.data
+        try:
+            self._sel.unregister(key.fd)
+        except (KeyError, ValueError):
+            pass
+        if on_error:
+            try:
+                on_error(dev, exc)
+            except Exception as e:
+                self.log.add(f"Input: on_error Fehler {getattr(dev, 'path', dev)}: {e}")
+        else:
+            self.log.add(f"Input: {getattr(dev, 'path', dev)} entfernt ({exc})")
+
+    def _dispatch(self, key):
+        kind, obj, cb, _ = key.data
+        if kind == "add_fd":
+            cb()
+            return
+
+        try:
+            events = list(obj.read())
+        except BlockingIOError:
+            return
+        except OSError as e:
+            if e.errno in (errno.ENODEV, errno.EIO, errno.EBADF):
+                self._drop(key, e)
+                return
+            raise
+
+        if not events:
+            return
+        self.batches += 1
+        self.events += len(events)
+        cb(obj, events)
+
+    def _run(self):
+        while not self._stop:
+            try:
+                ready = self._sel.select()
+            except OSError as e:
+                self.log.add(f"Input: select Fehler: {e}")
+                continue
+
+            self.wakeups += 1
+            for key, _ in ready:
+                if key.data is None:
+                    try:
+                        while os.read(self._wake_r, 64):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    self._apply_ops()
+                    continue
+                # Device evtl. in diesem Durchlauf schon entfernt
+                if self._sel.get_map().get(key.fd) is not key:
+                    continue
+                try:
+                    self._dispatch(key)
+                except Exception as e:
+                    self.log.add(f"Input: Handler Fehler {getattr(key.data[1], 'path', key.fd)}: {e}")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Input Record & Replay (evdev/uinput) – reproduzierbare Last auf touch_ctl/keyboard_wake.
+
+  # echtes Device aufnehmen (Ctrl+C beendet)
+  python input_replay.py record /dev/input/touchscreen drag.evr
+
+  # als virtuelles Device wieder abspielen (1x, 4x ...)
+  python input_replay.py replay drag.evr --speed 4
+
+  # Harness: Replay -> TouchController/KeyboardWake -> RelayController (pty-Simulator)
+  python input_replay.py bench drag.evr --speeds 1,4,16,64
+
+Dateiformat (.evr):
+  b"SPGLEVR1" | u32 Länge | JSON (Name, Capabilities inkl. absinfo) |
+  Records "<dHHi": Zeit seit Start [s], type, code, value (16 Byte pro Event)
+
+Der Bench misst Ende-zu-Ende Latenz vom Kernel-Zeitstempel des auslösenden
+Frames bis Callback, Relay-Write (Future erfüllt) und Overlay-hide sowie den
+Dispatch-Rückstand pro Geschwindigkeit. Braucht /dev/uinput (Gruppe input bzw. root),
+aber kein echtes Panel.
+"""
+import argparse
+import json
+import struct
+import sys
+import time
+
+from evdev import InputDevice, UInput, AbsInfo, ecodes
+
+MAGIC = b"SPGLEVR1"
+_REC = struct.Struct("<dHHi")
+_LEN = struct.Struct("<I")
+
+
+# ---------- Datei ----------
+
+def _caps_to_json(caps):
+    out = {}
+    for etype, codes in caps.items():
+        if etype in (ecodes.EV_SYN, ecodes.EV_FF):
+            continue
+        items = []
+        for c in codes:
+            if isinstance(c, tuple):
+                code, info = c
+                items.append([code, list(info)])
+            else:
+                items.append(c)
+        out[str(etype)] = items
+    return out
+
+
+def _caps_from_json(data):
+    caps = {}
+    for etype, items in data.items():
+        codes = []
+        for c in items:
+            if isinstance(c, list):
+                codes.append((c[0], AbsInfo(*c[1])))
+            else:
+                codes.append(c)
+        caps[int(etype)] = codes
+    return caps
+
+
+def load(path):
+    """-> (meta, [(t, type, code, value), ...])"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: keine .evr Datei")
+        (ln,) = _LEN.unpack(f.read(_LEN.size))
+        meta = json.loads(f.read(ln).decode("utf-8"))
+        body = f.read()
+    usable = len(body) - len(body) % _REC.size
+    return meta, list(_REC.iter_unpack(body[:usable]))
+
+
+def record(device: str, path: str, seconds: float = 0.0):
+    dev = InputDevice(device)
+    meta = {
+        "name": dev.name,
+        "path": device,
+        "recorded_at": time.strftime("%F %T"),
+        "capabilities": _caps_to_json(dev.capabilities(absinfo=True)),
+    }
+    head = json.dumps(meta).encode("utf-8")
+
+    n = 0
+    t0 = None
+    stop_at = time.time() + seconds if seconds > 0 else None
+    with open(path, "wb") as f:
+        f.write(MAGIC + _LEN.pack(len(head)) + head)
+        print(f"Aufnahme {dev.path} ({dev.name}) -> {path} (Ctrl+C beendet)")
+        try:
+            for ev in dev.read_loop():
+                ts = ev.sec + ev.usec / 1e6
+                if t0 is None:
+                    t0 = ts
+                f.write(_REC.pack(ts - t0, ev.type, ev.code, ev.value))
+                n += 1
+                if stop_at and time.time() >= stop_at:
+                    break
+        except KeyboardInterrupt:
+            pass
+    print(f"{n} Events gespeichert")
+
+
+# ---------- Replay ----------
+
+def open_uinput(meta, name_suffix=" (replay)"):
+    ui = UInput(events=_caps_from_json(meta["capabilities"]), name=(meta.get("name") or "replay") + name_suffix)
+    time.sleep(0.3)  # udev Zeit geben, den Node anzulegen/Rechte zu setzen
+    return ui
+
+
+def replay(ui, records, speed: float = 1.0):
+    """Spielt Records mit Originaltiming / speed ab (speed <= 0: so schnell wie möglich)."""
+    start = time.monotonic()
+    for t, etype, code, value in records:
+        if speed > 0:
+            delay = start + t / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        ui.write(etype, code, value)
+    return time.monotonic() - start
+
+
+# ---------- Bench ----------
+
+class _QuietLog:
+    def add(self, msg: str):
+        pass
+
+
+class _RecordingOverlay:
+    """Overlay-Ersatz für den Harness: merkt sich nur den Zeitpunkt von hide()."""
+
+    def __init__(self):
+        self.hidden_at = None
+
+    def hide(self):
+        self.hidden_at = time.time()
+
+    def show(self):
+        pass
+
+    def running(self):
+        return False
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _fmt(name, samples):
+    ms = [x * 1000.0 for x in samples]
+    if not ms:
+        return f"  {name:<10} n=0"
+    return (f"  {name:<10} n={len(ms):<5} p50={_pct(ms, .5):8.2f}ms p95={_pct(ms, .95):8.2f}ms "
+            f"p99={_pct(ms, .99):8.2f}ms max={max(ms):8.2f}ms")
+
+
+def bench(path: str, speeds, lag_budget_ms: float, coalesce_ms: int):
+    from input_reactor import InputReactor
+    from keyboard_wake import KeyboardWake
+    from relay import RelayController
+    from relay_sim import RelaySimulator
+    from touch_ctl import TouchController
+
+    meta, records = load(path)
+    is_touch = str(ecodes.EV_ABS) in meta["capabilities"]
+    span = records[-1][0] if records else 0.0
+    print(f"{path}: {len(records)} Events, {span:.2f}s, {'Touch' if is_touch else 'Keyboard'} ({meta.get('name')})")
+
+    log = _QuietLog()
+    sim = RelaySimulator(log=lambda m: None).start()
+    relay = RelayController(sim.device, 9600, log, coalesce_ms=coalesce_ms)
+    overlay = _RecordingOverlay()
+    reactor = InputReactor(log)
+    ui = open_uinput(meta)
+
+    samples = {"callback": [], "relay": [], "overlay": [], "lag": []}
+    state = {"ctl": None}
+
+    def on_input():
+        t_cb = time.time()
+        ctl = state["ctl"]
+        # Kernel-Zeitstempel des auslösenden Frames bzw. Tastendrucks
+        t_ev = ctl.last_frame_ts if is_touch else ctl.last_event_ts
+        samples["callback"].append(t_cb - t_ev)
+        fut = relay.activate_for(300, on_start=overlay.hide, on_end=None)
+        samples["overlay"].append(overlay.hidden_at - t_ev)
+
+        def _written(f):
+            samples["relay"].append(time.time() - t_ev)
+            # Relais nach dem Write wieder aus, damit jede Geste einen echten Write kostet
+            relay.off()
+
+        fut.add_done_callback(_written)
+
+    def timed(orig):
+        # Dispatch-Rückstand: Kernel-Zeitstempel des letzten Events vs. Verarbeitung, pro Batch
+        def _on_events(dev, events):
+            samples["lag"].append(time.time() - (events[-1].sec + events[-1].usec / 1e6))
+            orig(dev, events)
+        return _on_events
+
+    try:
+        if is_touch:
+            ctl = TouchController(ui.device.path, 10, 10, log, refire_interval=0, reactor=reactor)
+            ctl.set_on_touch(on_input)
+            ctl._on_events = timed(ctl._on_events)
+            state["ctl"] = ctl
+            ctl.start_monitor()
+        else:
+            ctl = KeyboardWake(log, on_keypress=on_input, reactor=reactor, pattern=ui.device.path)
+            ctl._on_events = timed(ctl._on_events)
+            state["ctl"] = ctl
+            ctl.start()
+        time.sleep(0.2)
+
+        sustained = 0.0
+        for speed in speeds:
+            for v in samples.values():
+                v.clear()
+            before = reactor.events
+            took = replay(ui, records, speed)
+            time.sleep(0.5)
+            handled = reactor.events - before
+            rate = handled / took if took > 0 else 0.0
+            lag_p95 = _pct(samples["lag"], .95) * 1000.0
+            ok = lag_p95 <= lag_budget_ms
+            if ok:
+                sustained = max(sustained, rate)
+            label = "max" if speed <= 0 else f"{speed:g}x"
+            print(f"Speed {label}: {handled}/{len(records)} Events in {took:.2f}s = {rate:.0f} ev/s, "
+                  f"Rückstand p95 {lag_p95:.2f}ms {'OK' if ok else 'ZU LANGSAM'}")
+            for name in ("lag", "callback", "relay", "overlay"):
+                print(_fmt(name, samples[name]))
+        print(f"Sustained: {sustained:.0f} Events/s (Rückstand p95 <= {lag_budget_ms}ms)")
+        print(f"Relais: {relay.queue_info()} Simulator-Frames={len(sim.frames)}")
+    finally:
+        reactor.stop()
+        relay.close()
+        ui.close()
+        sim.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="evdev Record & Replay")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    r = sub.add_parser("record", help="Device aufnehmen")
+    r.add_argument("device")
+    r.add_argument("file")
+    r.add_argument("--seconds", type=float, default=0.0)
+
+    p = sub.add_parser("replay", help="über uinput abspielen")
+    p.add_argument("file")
+    p.add_argument("--speed", type=float, default=1.0, help="1 = Echtzeit, 0 = so schnell wie möglich")
+    p.add_argument("--loop", type=int, default=1)
+
+    b = sub.add_parser("bench", help="Replay gegen TouchController/KeyboardWake + Relais-Simulator")
+    b.add_argument("file")
+    b.add_argument("--speeds", default="1,4,16,0", help="Komma-Liste, 0 = so schnell wie möglich")
+    b.add_argument("--lag-budget-ms", type=float, default=20.0)
+    b.add_argument("--coalesce-ms", type=int, default=5)
+
+    args = ap.parse_args()
+    if args.cmd == "record":
+        record(args.device, args.file, args.seconds)
+    elif args.cmd == "replay":
+        meta, records = load(args.file)
+        ui = open_uinput(meta)
+        try:
+            print(f"Replay {len(records)} Events über {ui.device.path} ({args.speed}x)")
+            for _ in range(max(1, args.loop)):
+                took = replay(ui, records, args.speed)
+                print(f"  {took:.2f}s, {len(records) / took if took else 0:.0f} Events/s")
+        finally:
+            ui.close()
+    else:
+        speeds = [float(x) for x in args.speeds.split(",") if x.strip()]
+        bench(args.file, speeds, args.lag_budget_ms, args.coalesce_ms)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,55 +1,93 @@
+import os
 import glob
 import threading
 from evdev import InputDevice, ecodes
 
+from input_reactor import InputReactor
+
+BY_ID_DIR = "/dev/input/by-id"
+
 class KeyboardWake:
     """
     Lauscht auf Keyboard-Devices (by-id *-kbd) und ruft callback bei Keypress auf.
+    Alle Tastaturen laufen über den gemeinsamen InputReactor (kein Thread pro Device).
+    Später eingesteckte / abgezogene Tastaturen werden per inotify erkannt.
     """
-    def __init__(self, log, on_keypress=None):
+    def __init__(self, log, on_keypress=None, reactor=None, pattern: str = ""):
         self.log = log
         self.on_keypress = on_keypress
-        self._thread = None
-        self._devices = []
+        self.pattern = pattern or os.path.join(BY_ID_DIR, "*-kbd")
+        self._reactor = reactor or InputReactor(log)
+        self._started = False
+        self._lock = threading.Lock()
+        self._devices = {}   # path -> InputDevice
+        self._watching_by_id = False
+        # Kernel-Zeitstempel (CLOCK_REALTIME) des Keypress, der den letzten Callback ausgelöst hat
+        self.last_event_ts = 0.0
 
     def _discover(self):
         # Stabil: /dev/input/by-id/*-kbd
-        paths = sorted(glob.glob("/dev/input/by-id/*-kbd"))
-        devs = []
-        for p in paths:
-            try:
-                devs.append(InputDevice(p))
-            except Exception:
-                pass
-        return devs
+        return sorted(glob.glob(self.pattern))
+
+    def _sync(self):
+        """Angemeldete Devices mit /dev/input/by-id abgleichen."""
+        paths = self._discover()
+        with self._lock:
+            for p in paths:
+                if p in self._devices:
+                    continue
+                try:
+                    dev = InputDevice(p)
+                except PermissionError:
+                    self.log.add(f"KeyboardWake: PermissionError {p} (udev/gruppenrechte)")
+                    continue
+                except Exception:
+                    continue
+                self._devices[p] = dev
+                self._reactor.add(dev, self._on_events, self._on_device_error)
+                self.log.add(f"KeyboardWake: lauscht auf {p}")
+
+            for p in list(self._devices):
+                if p not in paths:
+                    self._reactor.remove(self._devices.pop(p), close=True)
+                    self.log.add(f"KeyboardWake: entfernt {p}")
 
     def start(self):
-        if self._thread and self._thread.is_alive():
+        if self._started:
             return
-        self._thread = threading.Thread(target=self._run, daemon=True)
-        self._thread.start()
+        self._started = True
+
+        # /dev/input/by-id existiert erst, wenn ein USB-Input-Device da ist
+        self._reactor.watch_dir("/dev/input", self._on_hotplug)
+        self._watching_by_id = self._reactor.watch_dir(BY_ID_DIR, self._on_hotplug)
+        self._reactor.start()
 
-    def _run(self):
-        self._devices = self._discover()
+        self._sync()
         if not self._devices:
-            self.log.add("KeyboardWake: kein *-kbd Device gefunden unter /dev/input/by-id/")
-            return
+            self.log.add("KeyboardWake: kein *-kbd Device gefunden unter /dev/input/by-id/ (warte auf Hotplug)")
 
-        names = ", ".join([d.path for d in self._devices])
-        self.log.add(f"KeyboardWake: lauscht auf {names}")
+    def _on_hotplug(self, name: str, mask: int):
+        if not self._watching_by_id and name == "by-id":
+            self._watching_by_id = self._reactor.watch_dir(BY_ID_DIR, self._on_hotplug)
+        self._sync()
 
-        # Einfachste Variante: loop auf jedem device in eigenem thread
-        for dev in self._devices:
-            threading.Thread(target=self._loop_dev, args=(dev,), daemon=True).start()
+    def _on_events(self, dev: InputDevice, events):
+        # ein Callback pro Batch, auch wenn mehrere Tasten im selben read() stecken
+        down = next((ev for ev in events if ev.type == ecodes.EV_KEY and ev.value == 1), None)  # key down
+        if down is not None:
+            self.last_event_ts = down.sec + down.usec / 1e6
+            self.log.add(f"KeyboardWake: Keypress auf {dev.path}")
+            if self.on_keypress:
+                self.on_keypress()
 
-    def _loop_dev(self, dev: InputDevice):
+    def _on_device_error(self, dev: InputDevice, exc):
+        self.log.add(f"KeyboardWake: Fehler {dev.path}: {exc}")
+        with self._lock:
+            if self._devices.get(dev.path) is dev:
+                del self._devices[dev.path]
         try:
-            for ev in dev.read_loop():
-                if ev.type == ecodes.EV_KEY and ev.value == 1:  # key down
-                    self.log.add(f"KeyboardWake: Keypress auf {dev.path}")
-                    if self.on_keypress:
-                        self.on_keypress()
-        except PermissionError:
-            self.log.add(f"KeyboardWake: PermissionError {dev.path} (udev/gruppenrechte)")
-        except Exception as e:
-            self.log.add(f"KeyboardWake: Fehler {dev.path}: {e}")
+            dev.close()
+        except Exception:
+            pass
+        # Symlink evtl. schon wieder da (Reset)
+        self._sync()
@@ -0,0 +1,112 @@
+import time
+import threading
+from contextlib import contextmanager
+
+# Wake-Pfad: Input -> Callback -> display.wake -> overlay.hide -> Relais-Write
+WAKE_STAGES = ("input", "display_wake", "overlay_hide", "relay_write", "total")
+
+
+def _bucket_bounds(lo: float = 0.0001, hi: float = 30.0, factor: float = 1.1):
+    # logarithmische Buckets 0.1 ms .. 30 s (~133 Stück, Perzentile max. 10 % zu hoch)
+    out = []
+    b = lo
+    while b < hi:
+        out.append(b)
+        b *= factor
+    out.append(hi)
+    return out
+
+
+_BOUNDS = _bucket_bounds()
+
+
+class Histogram:
+    """
+    Latenz-Histogramm mit festen log-Buckets: record() ist O(log n) ohne
+    Allokation, Perzentile werden aus den Bucket-Grenzen gelesen.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(_BOUNDS) + 1)   # letzter Bucket: > 30 s
+        self.n = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def record(self, seconds: float):
+        seconds = max(0.0, seconds)
+        lo, hi = 0, len(_BOUNDS)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if _BOUNDS[mid] < seconds:
+                lo = mid + 1
+            else:
+                hi = mid
+        self.counts[lo] += 1
+        self.n += 1
+        self.sum += seconds
+        self.last = seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p: float) -> float:
+        if not self.n:
+            return 0.0
+        rank = p * self.n
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if c and seen >= rank:
+                # obere Bucket-Grenze, aber nie über dem gemessenen Maximum
+                return min(_BOUNDS[i] if i < len(_BOUNDS) else self.max, self.max)
+        return self.max
+
+    def info(self):
+        ms = lambda s: round(s * 1000.0, 2)
+        return {
+            "n": self.n,
+            "p50_ms": ms(self.percentile(0.50)),
+            "p95_ms": ms(self.percentile(0.95)),
+            "p99_ms": ms(self.percentile(0.99)),
+            "max_ms": ms(self.max),
+            "last_ms": ms(self.last),
+            "avg_ms": ms(self.sum / self.n) if self.n else 0.0,
+        }
+
+
+class LatencyTracker:
+    """
+    Zeitmessung pro Stufe (Spans) für den Wake-Pfad.
+
+      with latency.span("display_wake"):
+          display.wake()
+      latency.record("input", time.time() - event_ts)
+    """
+
+    def __init__(self, stages=WAKE_STAGES):
+        self._lock = threading.Lock()
+        self._hist = {s: Histogram() for s in stages}
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            h = self._hist.get(stage)
+            if h is None:
+                h = self._hist[stage] = Histogram()
+            h.record(seconds)
+
+    @contextmanager
+    def span(self, stage: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t0)
+
+    def reset(self):
+        with self._lock:
+            for s in self._hist:
+                self._hist[s] = Histogram()
+
+    def info(self):
+        with self._lock:
+            return {s: h.info() for s, h in self._hist.items()}
@@ -0,0 +1,308 @@
+import os
+import json
+import time
+import socket
+import threading
+import subprocess
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from proc_supervisor import ProcessSupervisor
+
+
+class MpvError(Exception):
+    pass
+
+
+class MpvIpc:
+    """
+    Ein langlebiger mpv für Overlay (schwarzes PNG) und RTSP, gesteuert über
+    --input-ipc-server (JSON IPC, ein Kommando pro Zeile).
+
+    Statt pro Bildschirmwechsel mpv neu zu starten (Prozess + GPU-Kontext +
+    X-Fenster) wird nur noch per `loadfile` umgeschaltet; Modus-Wechsel laufen
+    über set_property (vf, keepaspect). Jeder Wechsel ist ein IPC-Round-Trip.
+
+    `owner` merkt sich, wer gerade etwas anzeigt ("overlay" / "rtsp"), damit
+    z. B. overlay.hide() keinen laufenden Stream beendet.
+
+    Ohne geladene Datei ist mpv idle (--idle, --force-window=no): kein Fenster,
+    der Prozess bleibt aber stehen.
+    """
+
+    ARGS = [
+        "mpv",
+        "--idle=yes",
+        "--force-window=no",
+        "--no-terminal",
+        "--fs",
+        "--ontop",
+        "--no-osc",
+        "--vo=gpu",
+        "--image-display-duration=inf",
+        "--rtsp-transport=tcp",
+        "--profile=low-latency",
+        "--cache=no",
+    ]
+
+    def __init__(self, display_ctl, log, socket_path: str, log_path: str = "/tmp/mpv_ipc.log", supervisor=None):
+        self.display_ctl = display_ctl
+        self.log = log
+        self._sup = supervisor or ProcessSupervisor(log)
+        self.socket_path = socket_path
+        self.log_path = log_path
+
+        self._lock = threading.RLock()       # Prozess/Verbindung
+        self._send_lock = threading.Lock()
+        self._proc = None
+        self._sock = None
+        self._reader = None
+        self._next_id = 0
+        self._pending = {}                   # request_id -> Future
+        self._event_handlers = {}            # event name -> [callback(event)]
+        self._observers = {}                 # observe id -> (name, callback(value))
+        self._closing = False
+
+        self.owner = None
+        self.path = None
+        self.starts = 0
+        self.commands = 0
+
+    # ---------- Prozess ----------
+
+    def alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None and self._sock is not None
+
+    def ensure(self):
+        """mpv starten bzw. nach Absturz neu starten und verbinden."""
+        with self._lock:
+            if self.alive():
+                return
+            self._teardown()
+            self._closing = False
+
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+            cmd = self.ARGS + [f"--input-ipc-server={self.socket_path}"]
+            logf = open(self.log_path, "a", buffering=1)
+            logf.write(f"\n--- {time.strftime('%F %T')} MPV IPC START ---\nCMD: {' '.join(cmd)}\n")
+            try:
+                self._proc = subprocess.Popen(
+                    cmd, env=self.display_ctl.env(),
+                    stdin=subprocess.DEVNULL, stdout=logf, stderr=logf,
+                    start_new_session=True,
+                )
+            except FileNotFoundError:
+                raise MpvError("mpv nicht gefunden (installiere mpv)")
+            finally:
+                logf.close()
+            self._sup.watch(self._proc, "mpv")
+
+            # Socket erscheint erst nach der Initialisierung
+            deadline = time.monotonic() + 5.0
+            while True:
+                try:
+                    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    s.connect(self.socket_path)
+                    break
+                except OSError:
+                    s.close()
+                    if self._proc.poll() is not None or time.monotonic() > deadline:
+                        self._teardown()
+                        raise MpvError(f"mpv IPC nicht erreichbar (siehe {self.log_path})")
+                    time.sleep(0.02)
+
+            self._sock = s
+            self._reader = threading.Thread(target=self._read_loop, args=(s,), daemon=True)
+            self._reader.start()
+            self.starts += 1
+            self.owner = None
+            self.path = None
+
+            # Observer nach Neustart wieder anmelden
+            for oid, (name, _) in self._observers.items():
+                self._send(["observe_property", oid, name])
+
+            self.log.add(f"mpv: IPC bereit ({self.socket_path}, pid {self._proc.pid})")
+
+    def _teardown(self):
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self._sock.close()
+            self._sock = None
+        proc, self._proc = self._proc, None
+        if proc is not None and proc.poll() is None:
+            self._sup.kill(proc, "mpv")
+        self._fail_pending(MpvError("mpv beendet"))
+        self.owner = None
+        self.path = None
+
+    def close(self):
+        exited = None
+        with self._lock:
+            self._closing = True
+            if self.alive():
+                try:
+                    self._send(["quit"])
+                except Exception:
+                    pass
+                # quit ist asynchron; hängt mpv, eskaliert der Supervisor auf SIGKILL
+                exited = self._sup.terminate(self._proc, "mpv", timeout=1.0)
+                self._proc = None
+            self._teardown()
+        if exited is not None:
+            try:
+                exited.result(timeout=2.0)
+            except Exception:
+                pass
+
+    # ---------- Protokoll ----------
+
+    def _fail_pending(self, exc):
+        pending, self._pending = self._pending, {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(exc)
+
+    def _send(self, args) -> Future:
+        fut = Future()
+        with self._send_lock:
+            self._next_id += 1
+            rid = self._next_id
+            self._pending[rid] = fut
+            data = json.dumps({"command": args, "request_id": rid}).encode("utf-8") + b"\n"
+            try:
+                self._sock.sendall(data)
+            except (OSError, AttributeError) as e:
+                self._pending.pop(rid, None)
+                raise MpvError(f"mpv IPC senden: {e}")
+        self.commands += 1
+        return fut
+
+    def _read_loop(self, sock):
+        buf = b""
+        while True:
+            try:
+                chunk = sock.recv(65536)
+            except OSError:
+                chunk = b""
+            if not chunk:
+                break
+            buf += chunk
+            while b"\n" in buf:
+                line, buf = buf.split(b"\n", 1)
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                self._handle(msg)
+
+        # Verbindung weg (mpv beendet/abgestürzt)
+        if sock is self._sock and not self._closing:
+            self._fail_pending(MpvError("mpv IPC getrennt"))
+            self.log.add("mpv: IPC getrennt")
+            self._dispatch({"event": "ipc-lost"})
+
+    def _handle(self, msg):
+        if "request_id" in msg and "event" not in msg:
+            fut = self._pending.pop(msg["request_id"], None)
+            if fut is None or fut.done():
+                return
+            if msg.get("error") == "success":
+                fut.set_result(msg.get("data"))
+            else:
+                fut.set_exception(MpvError(msg.get("error", "unbekannter Fehler")))
+            return
+
+        if msg.get("event") == "property-change":
+            obs = self._observers.get(msg.get("id"))
+            if obs:
+                try:
+                    obs[1](msg.get("data"))
+                except Exception as e:
+                    self.log.add(f"mpv: Observer {obs[0]} Fehler: {e}")
+            return
+        self._dispatch(msg)
+
+    def _dispatch(self, msg):
+        for cb in list(self._event_handlers.get(msg.get("event"), ())):
+            try:
+                cb(msg)
+            except Exception as e:
+                self.log.add(f"mpv: Event-Handler {msg.get('event')} Fehler: {e}")
+
+    # ---------- API ----------
+
+    def command(self, *args, timeout: float = 2.0):
+        self.ensure()
+        fut = self._send(list(args))
+        try:
+            return fut.result(timeout=timeout)
+        except FutureTimeout:
+            raise MpvError(f"mpv antwortet nicht auf {args[0]}")
+
+    def set_property(self, name: str, value):
+        return self.command("set_property", name, value)
+
+    def get_property(self, name: str, default=None, timeout: float = 2.0):
+        try:
+            return self.command("get_property", name, timeout=timeout)
+        except MpvError:
+            return default
+
+    def on_event(self, name: str, callback):
+        """callback(event_dict) auf dem Reader-Thread; "ipc-lost" wenn mpv weg ist."""
+        self._event_handlers.setdefault(name, []).append(callback)
+
+    def observe(self, name: str, callback):
+        """callback(value) bei jeder Änderung der Property (Reader-Thread)."""
+        with self._lock:
+            oid = len(self._observers) + 1
+            self._observers[oid] = (name, callback)
+            if self.alive():
+                self._send(["observe_property", oid, name])
+        return oid
+
+    def load(self, path: str, owner: str):
+        """Ersetzt die aktuelle Anzeige (kein Prozessstart, Fenster bleibt offen)."""
+        with self._lock:
+            # owner vor dem Kommando setzen: ein sofortiges end-file (error) kommt vor der Antwort
+            prev = (self.owner, self.path)
+            self.owner = owner
+            self.path = path
+            try:
+                self.command("loadfile", path, "replace")
+            except Exception:
+                self.owner, self.path = prev
+                raise
+
+    def unload(self, owner: str) -> bool:
+        """Anzeige beenden, aber nur wenn `owner` gerade anzeigt. mpv bleibt idle."""
+        with self._lock:
+            if self.owner != owner:
+                return False
+            self.owner = None
+            self.path = None
+            if self.alive():
+                try:
+                    self.command("stop")
+                except MpvError as e:
+                    self.log.add(f"mpv: stop Fehler: {e}")
+            return True
+
+    def showing(self, owner: str) -> bool:
+        return self.owner == owner and self.alive()
+
+    def info(self):
+        return {
+            "alive": self.alive(),
+            "pid": self._proc.pid if self._proc is not None else None,
+            "owner": self.owner,
+            "starts": self.starts,
+            "commands": self.commands,
+        }
@@ -9,6 +9,7 @@ class MqttBridge:
     Base topics:
       kiosk/<hostname>/availability   online/offline (LWT)
       kiosk/<hostname>/state          JSON state
+      kiosk/<hostname>/display/off_at ISO-Zeitpunkt Display aus (retained, nur bei Änderung)
       kiosk/<hostname>/cmd/...        commands
     Discovery:
       homeassistant/<component>/<device_id>/<object>/config
@@ -29,6 +30,7 @@ class MqttBridge:
         self.avail_topic = f"{self.base}/availability"
         self.state_topic = f"{self.base}/state"
         self.cmd_base = f"{self.base}/cmd"
+        self.off_at_topic = f"{self.base}/display/off_at"
 
         self.interval = int(getattr(config, "MQTT_PUBLISH_INTERVAL", 5))
         self.retain_discovery = bool(getattr(config, "MQTT_RETAIN_DISCOVERY", True))
@@ -39,6 +41,9 @@ class MqttBridge:
         self._connected = False
         self._thread = None
 
+        self._off_at = None
+        self._off_at_published = False
+
     def start(self):
         if not getattr(self.cfg, "MQTT_ENABLED", True):
             self.log.add("MQTT: disabled")
@@ -86,6 +91,20 @@ class MqttBridge:
             return
         self._client.publish(topic, payload=payload, qos=qos, retain=retain)
 
+    def publish_display_off_at(self, iso):
+        """
+        Publiziert die absolute Ausschaltzeit (retained) nur wenn sie sich ändert.
+        None -> "None" (HA zeigt unknown).
+        """
+        if iso == self._off_at and self._off_at_published:
+            return
+        self._off_at = iso
+        self._off_at_published = False
+        if not self._client or not self._connected:
+            return
+        self._publish(self.off_at_topic, iso or "None", retain=True, qos=1)
+        self._off_at_published = True
+
     def publish_state_now(self):
         if self._client and self._connected:
             self._publish_state()
@@ -110,6 +129,8 @@ class MqttBridge:
         client.subscribe(f"{self.cmd_base}/#", qos=1)
 
         self._publish_discovery()
+        self._off_at_published = False
+        self.publish_display_off_at(self._off_at)
         self._publish_state()
 
     def _on_disconnect(self, client, userdata, rc):
@@ -164,6 +185,9 @@ class MqttBridge:
             ("rtsp_url", "RTSP url", "{{ value_json.rtsp.url }}", None),
             ("rtsp_mode", "RTSP mode", "{{ value_json.rtsp.mode }}", None),
             ("rtsp_remaining", "RTSP remaining", "{{ value_json.rtsp.remaining }}", "s"),
+            ("rtsp_fps", "RTSP fps", "{{ value_json.rtsp.fps | default(0, true) }}", "fps"),
+            ("rtsp_stall", "RTSP stall", "{{ value_json.rtsp.stall_s }}", "s"),
+            ("rtsp_reconnects", "RTSP reconnects", "{{ value_json.rtsp.reconnects }}", None),
             ("touch_locked", "Touch locked", "{{ value_json.touch_locked }}", None),
             ("touch_disabled", "Touch disabled", "{{ value_json.touch_disabled }}", None),
             ("display_remaining_seconds", "Display remaining", "{{ value_json.display_remaining_seconds }}", "s"),
@@ -189,6 +213,39 @@ class MqttBridge:
                 payload["unit_of_measurement"] = unit
             self._publish(dtopic("sensor", key), payload, retain=self.retain_discovery, qos=1)
 
+        # Absolute Ausschaltzeit: HA zählt selbst herunter, kein Polling nötig
+        self._publish(
+            dtopic("sensor", "display_off_at"),
+            {
+                **common,
+                "name": "Display off at",
+                "unique_id": f"{self.device_id}_display_off_at",
+                "state_topic": self.off_at_topic,
+                "device_class": "timestamp",
+            },
+            retain=self.retain_discovery,
+            qos=1,
+        )
+
+        # Diagnose: Wake-Latenz (Input -> Panel an), Stufen als Attribute
+        self._publish(
+            dtopic("sensor", "wake_latency_p95"),
+            {
+                **common,
+                "name": "Wake latency p95",
+                "unique_id": f"{self.device_id}_wake_latency_p95",
+                "state_topic": self.state_topic,
+                "value_template": "{{ value_json.wake_latency.total.p95_ms }}",
+                "json_attributes_topic": self.state_topic,
+                "json_attributes_template": "{{ value_json.wake_latency | tojson }}",
+                "unit_of_measurement": "ms",
+                "state_class": "measurement",
+                "entity_category": "diagnostic",
+            },
+            retain=self.retain_discovery,
+            qos=1,
+        )
+
         # ---------- MQTT SWITCHES als echte Toggle (State liefert ON/OFF) ----------
         def make_switch(obj_id: str, name: str, cmd_suffix: str, state_tpl_onoff: str):
             self._publish(
@@ -243,6 +300,16 @@ class MqttBridge:
             "{{ 'ON' if value_json.screen_on else 'OFF' }}",
         )
 
+        # Zusatzkanäle Mehrkanal-Relais (Kanal 1 = Backlight steckt in "Screen")
+        names = list(getattr(self.cfg, "RELAY_CHANNEL_NAMES", []))
+        for name in names[1:]:
+            make_switch(
+                f"relay_{name}_sw",
+                f"Relay {name}",
+                f"relay_channel/{name}",
+                "{{ value_json.relay_channels['" + name + "'] }}",
+            )
+
         # ---------- Text: RTSP URL ----------
         self._publish(
             dtopic("text", "rtsp_url_text"),
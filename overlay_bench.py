@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark Overlay-Backends: show/hide-Latenz und Speicher.
+
+  mpv-spawn  ein mpv-Prozess pro show() (MPV_IPC=0)
+  mpv-ipc    ein langlebiger mpv, show/hide per loadfile/stop (MPV_IPC=1)
+  x11        natives override-redirect Fenster über python-xlib (OVERLAY_BACKEND=x11)
+
+RSS = Summe VmRSS der mpv-Prozesse bzw. Zuwachs im eigenen Prozess (x11).
+Mit --xvfb läuft der Bench ohne echtes Display (braucht Xvfb).
+
+  python overlay_bench.py --xvfb -n 50
+  python overlay_bench.py --backends x11,mpv-ipc
+"""
+import argparse
+import os
+import sys
+import time
+
+from display_bench import start_xvfb, _summary
+from display_ctl import DisplayController
+from mpv_ipc import MpvIpc
+from overlay_black import BlackOverlay, X11BlackWindow
+
+
+class _QuietLog:
+    def add(self, msg: str):
+        pass
+
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def _wait_rss(pid: int, settle: float = 1.0) -> int:
+    # mpv braucht nach dem Start etwas, bis VO/GPU-Kontext stehen
+    time.sleep(settle)
+    return _rss_kb(pid)
+
+
+def bench(backend: str, display: DisplayController, n: int, png_path: str):
+    log = _QuietLog()
+    mpv = None
+    if backend == "mpv-ipc":
+        mpv = MpvIpc(display, log, "/tmp/overlay-bench-mpv.sock", log_path="/tmp/overlay-bench-mpv.log")
+    ov = BlackOverlay(png_path, display, log, mpv=mpv,
+                      backend="x11" if backend == "x11" else "mpv")
+    if backend == "x11" and ov.backend != "x11":
+        raise SystemExit("x11: python-xlib fehlt")
+
+    rss0 = _rss_kb(os.getpid())
+    show, hide = [], []
+    try:
+        # Aufwärmen: mpv-ipc startet hier seinen Prozess, x11 legt das Fenster an
+        ov.show()
+        if backend == "x11" and not ov._native.mapped:
+            raise RuntimeError("X11-Fenster nicht gemappt (Fallback auf mpv)")
+        if backend == "mpv-spawn":
+            rss = _wait_rss(ov._proc.pid)
+        elif backend == "mpv-ipc":
+            rss = _wait_rss(mpv.info()["pid"])
+        else:
+            rss = max(0, _rss_kb(os.getpid()) - rss0)
+        ov.hide()
+
+        for _ in range(n):
+            t0 = time.perf_counter()
+            ov.show()
+            show.append(time.perf_counter() - t0)
+
+            t0 = time.perf_counter()
+            ov.hide()
+            hide.append(time.perf_counter() - t0)
+    finally:
+        ov.hide()
+        ov.close()
+        if mpv:
+            mpv.close()
+    return show, hide, rss
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Overlay Benchmark (mpv vs. x11)")
+    ap.add_argument("--display", default=os.environ.get("DISPLAY", ":0"))
+    ap.add_argument("--xvfb", action="store_true", help="eigenen Xvfb starten (--display wird :99)")
+    ap.add_argument("-n", type=int, default=20, help="show/hide Zyklen pro Backend")
+    ap.add_argument("--backends", default="mpv-spawn,mpv-ipc,x11")
+    args = ap.parse_args()
+
+    xvfb = None
+    display = args.display
+    if args.xvfb:
+        display = ":99"
+        xvfb = start_xvfb(display)
+    os.environ["DISPLAY"] = display
+
+    ctl = DisplayController(display_default=display, log=_QuietLog(), backend="xset")
+    png_path = "/tmp/overlay-bench-black.png"
+    rows = []
+    try:
+        for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+            if backend == "x11" and not X11BlackWindow.available():
+                print("x11: python-xlib fehlt (pip install python-xlib) -> übersprungen")
+                continue
+            try:
+                show, hide, rss = bench(backend, ctl, args.n, png_path)
+            except Exception as e:
+                print(f"{backend}: Fehler {e} -> übersprungen")
+                continue
+            rows.append((backend, _summary("show", show), _summary("hide", hide), rss))
+    finally:
+        if xvfb:
+            xvfb.terminate()
+            xvfb.wait(timeout=5)
+
+    for backend, s, h, rss in rows:
+        print(f"{backend:<10} show p50={s['p50_ms']:>9.3f}ms p95={s['p95_ms']:>9.3f}ms  "
+              f"hide p50={h['p50_ms']:>9.3f}ms p95={h['p95_ms']:>9.3f}ms  RSS={rss / 1024:7.1f} MB")
+    sys.exit(0 if rows else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,227 @@
 import os
-import base64
+import zlib
+import struct
 import subprocess
-import signal
-import time
 import threading
 
+from display_ctl import xlib_connect, XlibDpms
+from proc_supervisor import ProcessSupervisor
+from scheduler import Worker
+
+try:
+    from Xlib import X
+except ImportError:
+    X = None
+
+
+def black_png(width: int, height: int) -> bytes:
+    """Schwarzes PNG (1 Bit Graustufen) in genau dieser Größe – mpv muss nicht skalieren."""
+    def chunk(tag, data):
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    row = b"\x00" * (1 + (width + 7) // 8)   # Filterbyte + Pixel (alle 0 = schwarz)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 1, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(row * height, 9))
+        + chunk(b"IEND", b"")
+    )
+
+
+def png_size(path: str):
+    """(breite, höhe) aus dem IHDR-Chunk, None wenn keine PNG-Datei."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(24)
+    except OSError:
+        return None
+    if len(head) < 24 or not head.startswith(b"\x89PNG"):
+        return None
+    return struct.unpack(">II", head[16:24])
+
+
+class X11BlackWindow:
+    """
+    Schwarzes Vollbild-Fenster direkt per Xlib: override-redirect (kein WM,
+    keine Deko), Hintergrund black_pixel (zeichnet der X-Server selbst, kein
+    Event-Loop nötig), unsichtbarer Cursor. show()/hide() sind map/unmap +
+    ein Round-Trip – kein Prozess, keine GPU-Pipeline.
+    """
+
+    def __init__(self, display_ctl, log):
+        self.display_ctl = display_ctl
+        self.log = log
+        self._d = None
+        self._win = None
+        self._env = None
+        self._stale = False
+        self.mapped = False
+
+    @staticmethod
+    def available() -> bool:
+        return XlibDpms.available()
+
+    def invalidate(self):
+        """Bildschirmgröße geändert: Fenster beim nächsten show() neu anlegen."""
+        self._stale = True
+
+    def _ensure(self):
+        env = self.display_ctl.env()
+        if self._d is not None and env is self._env and not self._stale:
+            return
+        self._close()
+
+        d = xlib_connect(env)
+        screen = d.screen()
+        root = screen.root
+
+        # 1x1 Bitmap ohne gesetzte Pixel als Cursor -> Mauszeiger unsichtbar
+        pix = root.create_pixmap(1, 1, 1)
+        cursor = pix.create_cursor(pix, (0, 0, 0), (0, 0, 0), 0, 0)
+        pix.free()
+
+        win = root.create_window(
+            0, 0, screen.width_in_pixels, screen.height_in_pixels, 0,
+            screen.root_depth, X.InputOutput, X.CopyFromParent,
+            background_pixel=screen.black_pixel,
+            override_redirect=1,
+            cursor=cursor,
+        )
+        win.set_wm_name("spiegel-black")
+        d.sync()
+
+        self._d, self._win, self._env = d, win, env
+        self._stale = False
+        self.log.add(f"Overlay: X11-Fenster {screen.width_in_pixels}x{screen.height_in_pixels} auf {env.get('DISPLAY')}")
+
+    def _close(self):
+        if self._d is not None:
+            try:
+                self._d.close()
+            except Exception:
+                pass
+        self._d = self._win = self._env = None
+        self.mapped = False
+
+    def _call(self, fn):
+        try:
+            self._ensure()
+            fn()
+        except Exception:
+            # X-Server neu gestartet o. ä. -> einmal neu verbinden
+            self._close()
+            self._ensure()
+            fn()
+
+    def show(self):
+        def _map():
+            self._win.map()
+            self._win.configure(stack_mode=X.Above)
+            self._d.sync()
+        self._call(_map)
+        self.mapped = True
+
+    def hide(self):
+        if self._d is None:
+            self.mapped = False
+            return
+        def _unmap():
+            self._win.unmap()
+            self._d.sync()
+        try:
+            _unmap()
+        except Exception:
+            # Verbindung weg = Fenster weg
+            self._close()
+        self.mapped = False
+
+    def close(self):
+        self._close()
+
+
 class BlackOverlay:
-    def __init__(self, png_path: str, png_b64: str, display_ctl, log):
+    def __init__(self, png_path: str, display_ctl, log, mpv=None, backend: str = "mpv",
+                 supervisor=None):
         self.png_path = png_path
-        self.png_b64 = png_b64
+        self._png_size = None
         self.display_ctl = display_ctl
         self.log = log
+        # gemeinsamer mpv (MpvIpc) statt eigenem Prozess pro show()
+        self.mpv = mpv
 
         self._lock = threading.Lock()
         self._proc = None
+        self._sup = supervisor or ProcessSupervisor(log)
+
+        # mpv | x11 – mpv bleibt Fallback, wenn das X11-Fenster nicht geht
+        self.backend = "mpv"
+        self._native = None
+        if backend == "x11":
+            if X11BlackWindow.available():
+                self._native = X11BlackWindow(display_ctl, log)
+                self.backend = "x11"
+            else:
+                log.add("Overlay: python-xlib fehlt (pip install python-xlib), nutze mpv")
+
+        # Neuaufbau nach Geometrie-Wechsel (IPC/X11) nicht auf dem Reactor-Thread
+        self._worker = Worker(log, "Overlay")
+        display_ctl.on_geometry_change(self._on_geometry)
 
     def ensure_png(self):
-        if os.path.exists(self.png_path) and os.path.getsize(self.png_path) > 0:
+        """Schwarzes PNG in Bildschirmgröße (neu bei anderer Größe, z. B. anderes Spiegel-Modell)."""
+        size = self.display_ctl.geometry()
+        if size == self._png_size:
             return
-        data = base64.b64decode(self.png_b64.encode("ascii"))
-        with open(self.png_path, "wb") as f:
-            f.write(data)
-        try:
-            os.chmod(self.png_path, 0o644)
-        except Exception:
-            pass
+        if png_size(self.png_path) != size:
+            with open(self.png_path, "wb") as f:
+                f.write(black_png(*size))
+            try:
+                os.chmod(self.png_path, 0o644)
+            except Exception:
+                pass
+            self.log.add(f"Overlay: {self.png_path} {size[0]}x{size[1]} erzeugt")
+        self._png_size = size
+
+    def _on_geometry(self, size):
+        # Reactor-Thread: nur weiterreichen
+        self._worker.submit("geometry", self._rebuild)
+
+    def _rebuild(self):
+        # sichtbares Overlay in neuer Größe neu aufbauen
+        with self._lock:
+            self._png_size = None
+            if self._native is not None:
+                self._native.invalidate()
+                if self._native.mapped:
+                    try:
+                        self._native.show()
+                    except Exception as e:
+                        self.log.add(f"Overlay: x11 Fehler ({e})")
+            if self.mpv is not None and self.mpv.showing("overlay"):
+                self.ensure_png()
+                try:
+                    self.mpv.load(self.png_path, owner="overlay")
+                except Exception as e:
+                    self.log.add(f"Overlay: Neuladen fehlgeschlagen: {e}")
 
     def _kill_group(self, proc, name: str):
+        # asynchron: SIGTERM jetzt, SIGKILL später über den Supervisor – der Lock wird nicht gehalten
         if not proc or proc.poll() is not None:
             return
-        try:
-            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-            for _ in range(30):
-                if proc.poll() is not None:
-                    break
-                time.sleep(0.05)
-            if proc.poll() is None:
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-            self.log.add(f"{name}: beendet")
-        except Exception as e:
-            self.log.add(f"{name}: kill Fehler: {e}")
+        self._sup.terminate(proc, name)
 
     def show(self):
+        if self._native is not None:
+            with self._lock:
+                try:
+                    if not self._native.mapped:
+                        self._native.show()
+                        self.log.add("Overlay: BLACK an (x11)")
+                    return
+                except Exception as e:
+                    self.log.add(f"Overlay: x11 Fehler ({e}), Fallback mpv")
+        if self.mpv is not None:
+            return self._show_ipc()
         with self._lock:
             if self._proc and self._proc.poll() is None:
                 return
@@ -53,16 +233,46 @@ class BlackOverlay:
                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
                     start_new_session=True
                 )
+                self._sup.watch(self._proc, "Overlay")
                 self.log.add("Overlay: BLACK an")
             except Exception as e:
                 self.log.add(f"Overlay: Startfehler: {e}")
                 self._proc = None
 
+    def _show_ipc(self):
+        with self._lock:
+            if self.mpv.showing("overlay"):
+                return
+            self.ensure_png()
+            try:
+                self.mpv.load(self.png_path, owner="overlay")
+                self.log.add("Overlay: BLACK an (mpv IPC)")
+            except Exception as e:
+                self.log.add(f"Overlay: Startfehler: {e}")
+
     def hide(self):
+        if self._native is not None:
+            with self._lock:
+                if self._native.mapped:
+                    self._native.hide()
+                    self.log.add("Overlay: aus (x11)")
+        if self.mpv is not None:
+            with self._lock:
+                if self.mpv.unload("overlay"):
+                    self.log.add("Overlay: aus (mpv IPC)")
+            return
         with self._lock:
             self._kill_group(self._proc, "Overlay")
             self._proc = None
 
     def running(self) -> bool:
+        if self._native is not None and self._native.mapped:
+            return True
+        if self.mpv is not None:
+            return self.mpv.showing("overlay")
         with self._lock:
             return self._proc is not None and self._proc.poll() is None
+
+    def close(self):
+        if self._native is not None:
+            self._native.close()
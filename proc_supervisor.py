@@ -0,0 +1,154 @@
+import os
+import signal
+import selectors
+import threading
+from concurrent.futures import Future
+
+from scheduler import DeadlineScheduler
+
+
+class ProcessSupervisor:
+    """
+    Gemeinsame Überwachung der Kindprozesse (mpv für Overlay/RTSP).
+
+    - watch(proc) liefert ein Future, das mit dem Returncode erfüllt wird,
+      sobald der Prozess endet; ein Thread wartet per pidfd (epoll) auf alle
+      Kinder und reapt sie (kein Busy-Polling, keine Zombies)
+    - terminate(proc) schickt SIGTERM an die Prozessgruppe und kehrt sofort
+      zurück; ist der Prozess nach `timeout` noch da, folgt SIGKILL über eine
+      Scheduler-Deadline. Aufrufer halten also keine Locks, während ein
+      hängender mpv stirbt.
+
+    Ohne pidfd (Kernel < 5.3) wartet ein kurzer Thread pro Prozess auf wait().
+    """
+
+    def __init__(self, log, scheduler=None):
+        self.log = log
+        self._scheduler = scheduler or DeadlineScheduler(log)
+
+        self._lock = threading.Lock()
+        self._futures = {}   # pid -> Future
+        self._names = {}     # pid -> Name fürs Log
+        self._sel = None
+        self._wake_r = self._wake_w = None
+        self._thread = None
+        self._pidfd = hasattr(os, "pidfd_open")
+
+        self.exited = 0
+        self.killed = 0
+
+    # ---------- API ----------
+
+    def watch(self, proc, name: str = "proc") -> Future:
+        """Future(returncode) für proc; mehrfacher Aufruf liefert dasselbe Future."""
+        with self._lock:
+            fut = self._futures.get(proc.pid)
+            if fut is not None:
+                return fut
+            fut = Future()
+            self._futures[proc.pid] = fut
+            self._names[proc.pid] = name
+
+        if self._pidfd:
+            try:
+                fd = os.pidfd_open(proc.pid)
+            except ProcessLookupError:
+                # schon weg (und evtl. schon gereapt)
+                self._exited(proc)
+                return fut
+            except OSError:
+                self._pidfd = False
+            else:
+                self._register(fd, proc)
+                return fut
+
+        threading.Thread(target=lambda: (proc.wait(), self._exited(proc)), daemon=True).start()
+        return fut
+
+    def terminate(self, proc, name: str = "proc", timeout: float = 1.5) -> Future:
+        """SIGTERM an die Gruppe, SIGKILL nach timeout; Future(returncode) ohne zu blockieren."""
+        fut = self.watch(proc, name)
+        if fut.done():
+            return fut
+        self._signal(proc, signal.SIGTERM)
+
+        key = ("kill", proc.pid)
+
+        def _escalate():
+            if proc.poll() is None:
+                self.killed += 1
+                self.log.add(f"{name}: reagiert nicht auf SIGTERM -> SIGKILL")
+                self._signal(proc, signal.SIGKILL)
+
+        self._scheduler.schedule(key, timeout, _escalate)
+        fut.add_done_callback(lambda f: self._scheduler.cancel(key))
+        return fut
+
+    def kill(self, proc, name: str = "proc") -> Future:
+        fut = self.watch(proc, name)
+        if not fut.done():
+            self._signal(proc, signal.SIGKILL)
+        return fut
+
+    def info(self):
+        with self._lock:
+            running = len(self._futures)
+        return {"running": running, "exited": self.exited, "killed": self.killed}
+
+    # ---------- intern ----------
+
+    def _signal(self, proc, sig):
+        if proc.returncode is not None:
+            return
+        try:
+            # start_new_session=True -> Prozessgruppe == pid
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            try:
+                proc.send_signal(sig)
+            except Exception:
+                pass
+
+    def _exited(self, proc):
+        try:
+            rc = proc.wait(timeout=0) if proc.returncode is None else proc.returncode
+        except Exception:
+            rc = proc.returncode
+        with self._lock:
+            fut = self._futures.pop(proc.pid, None)
+            name = self._names.pop(proc.pid, "proc")
+        if fut is None or fut.done():
+            return
+        self.exited += 1
+        self.log.add(f"{name}: beendet rc={rc}")
+        fut.set_result(rc)
+
+    def _register(self, fd, proc):
+        with self._lock:
+            if self._sel is None:
+                self._sel = selectors.DefaultSelector()
+                self._wake_r, self._wake_w = os.pipe()
+                os.set_blocking(self._wake_r, False)
+                self._sel.register(self._wake_r, selectors.EVENT_READ, None)
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._sel.register(fd, selectors.EVENT_READ, proc)
+        # Selector neu einlesen lassen
+        os.write(self._wake_w, b"\0")
+
+    def _run(self):
+        while True:
+            for key, _ in self._sel.select():
+                if key.data is None:
+                    try:
+                        os.read(self._wake_r, 64)
+                    except BlockingIOError:
+                        pass
+                    continue
+                # pidfd lesbar = Prozess beendet
+                with self._lock:
+                    self._sel.unregister(key.fd)
+                os.close(key.fd)
+                self._exited(key.data)
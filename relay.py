@@ -1,81 +1,522 @@
+import math
+import re
 import threading
 import time
+from concurrent.futures import Future
+
 import serial
 
-class RelayController:
-    def __init__(self, device: str, baudrate: int, log):
+from scheduler import DeadlineScheduler, Worker
+
+
+class SerialLink:
+    """
+    Langlebige serielle Verbindung zum USB-Relais.
+
+    Der Port wird einmal geöffnet und bleibt offen. Alle Schreib-/Lesezugriffe
+    laufen über einen Lock (keine verschachtelten Frames). Bei SerialException
+    (z. B. USB abgezogen / CH340 Reset) wird der Port verworfen und im
+    Hintergrund neu geöffnet, sobald das Device wieder da ist.
+    """
+
+    def __init__(self, device: str, baudrate: int, log, reconnect_interval: float = 2.0):
         self.device = device
         self.baudrate = baudrate
         self.log = log
+        self.reconnect_interval = reconnect_interval
 
         self._lock = threading.Lock()
-        self._timer = None
+        self._ser = None
+        self._stop = threading.Event()
+        self._reconnect_thread = None
+        # wird bei jedem (Neu-)Öffnen erhöht -> Aufrufer erkennen einen frischen Port
+        self.generation = 0
+
+    def _open(self):
+        # nur unter self._lock aufrufen
+        if self._ser is not None and self._ser.is_open:
+            return self._ser
+        self._ser = serial.Serial(self.device, baudrate=self.baudrate, timeout=1)
+        self.generation += 1
+        self.log.add(f"Relay: Port geöffnet {self.device}")
+        return self._ser
+
+    def _drop(self, err):
+        # nur unter self._lock aufrufen
+        try:
+            if self._ser is not None:
+                self._ser.close()
+        except Exception:
+            pass
+        self._ser = None
+        self.log.add(f"Relay: Verbindung verloren ({err}) -> reconnect im Hintergrund")
+        self._schedule_reconnect()
+
+    def _schedule_reconnect(self):
+        if self._stop.is_set():
+            return
+        if self._reconnect_thread and self._reconnect_thread.is_alive():
+            return
+        self._reconnect_thread = threading.Thread(target=self._reconnect_loop, daemon=True)
+        self._reconnect_thread.start()
 
-    def _send(self, data: bytes):
-        with serial.Serial(self.device, baudrate=self.baudrate, timeout=1) as ser:
+    def _reconnect_loop(self):
+        while not self._stop.wait(self.reconnect_interval):
+            with self._lock:
+                if self._ser is not None:
+                    return
+                try:
+                    self._open()
+                    return
+                except (serial.SerialException, OSError):
+                    pass
+
+    def _io(self, fn):
+        """
+        Führt fn(ser) unter dem Lock aus. Schlägt der Zugriff fehl, wird einmal
+        sofort neu geöffnet (Hotplug: Device ist unter gleichem Pfad wieder da),
+        danach übernimmt der Hintergrund-Reconnect.
+        """
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    return fn(self._open())
+                except (serial.SerialException, OSError) as e:
+                    self._drop(e)
+                    if attempt == 2:
+                        raise
+
+    def write(self, data: bytes):
+        def _w(ser):
             ser.write(data)
+            ser.flush()
+        self._io(_w)
+
+    def query(self, data: bytes, wait: float = 0.2, size: int = 64) -> bytes:
+        def _q(ser):
+            ser.reset_input_buffer()
+            ser.write(data)
+            time.sleep(wait)
+            # nur lesen was da ist – nicht auf `size` Bytes bzw. den 1 s Timeout warten
+            resp = ser.read(min(size, ser.in_waiting or 1))
+            return resp + ser.read(min(size - len(resp), ser.in_waiting))
+        return self._io(_q)
+
+    def connected(self) -> bool:
+        with self._lock:
+            return self._ser is not None and self._ser.is_open
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            try:
+                if self._ser is not None:
+                    self._ser.close()
+            except Exception:
+                pass
+            self._ser = None
+
+
+_STATUS_RE = re.compile(r"CH\s*(\d+)\s*:\s*(ON|OFF)", re.IGNORECASE)
+
+
+def frame(channel: int, on: bool) -> bytes:
+    """LCUS/CH340 Relais-Frame: A0 <kanal> <0|1> <checksumme>."""
+    state = 1 if on else 0
+    return bytes([0xA0, channel, state, (0xA0 + channel + state) & 0xFF])
+
+
+def parse_status(resp: str, channels: int) -> dict:
+    """
+    Antwort auf 0xFF auswerten.
+    Mehrkanal-Boards liefern z. B. "CH1: ON\\r\\nCH2: OFF", Einkanal-Boards nur "ON"/"OFF".
+    """
+    found = {int(ch): st.upper() for ch, st in _STATUS_RE.findall(resp) if 1 <= int(ch) <= channels}
+    if found:
+        return found
+    if "ON" in resp:
+        return {1: "ON"}
+    if "OFF" in resp:
+        return {1: "OFF"}
+    return {}
+
+
+class RelayController:
+    # Kanal des Display-Backlights: on()/off()/status() beziehen sich darauf
+    BACKLIGHT = 1
+    # gleicher Zustand auf demselben Kanal wird nur so kurz nach dem letzten Write
+    # verworfen (Touch-Stürme); danach wird wieder geschrieben, falls das Board
+    # extern geschaltet oder stromlos war
+    DEDUPE_S = 0.5
+    # reine Timer-Verlängerung (Touch-Refire): Listener höchstens so oft benachrichtigen
+    OFF_AT_NOTIFY_S = 5.0
 
-    def on(self):
-        self._send(b"\xA0\x01\x01\xA2")
-        self.log.add("Relay: ON")
+    def __init__(self, device: str, baudrate: int, log, reconnect_interval: float = 2.0,
+                 coalesce_ms: int = 5, scheduler=None, channels: int = 1, channel_names=None):
+        self.device = device
+        self.baudrate = baudrate
+        self.log = log
+
+        self.channels = max(1, min(8, channels))
+        names = list(channel_names or [])
+        self.channel_names = {
+            ch: (names[ch - 1] if ch - 1 < len(names) else f"ch{ch}")
+            for ch in range(1, self.channels + 1)
+        }
+
+        self._lock = threading.Lock()
+        self._link = SerialLink(device, baudrate, log, reconnect_interval=reconnect_interval)
+        self._scheduler = scheduler or DeadlineScheduler(log)
+        self._timer_key = f"relay:{device}"
+        # Ablauf-Callbacks (on_end: Overlay/mpv) nicht auf dem Scheduler-Thread
+        self._worker = Worker(log, "Relay")
+        self._timer_seq = 0   # erhöht bei jedem Setzen/Abbrechen -> veraltete Abläufe erkennen
+        self._notify_key = f"relay-notify:{device}"
+
+        # Timer-Zustand für Clients: dauerhaft an bzw. geplante Ausschaltzeit
+        # (Wall-Clock, einmal pro Änderung berechnet -> kein Jitter)
+        self.force_on = False
+        self._off_at = None
+        self._listeners = []
+
+        # Shadow-State je Kanal: zuletzt geschalteter Zustand ("ON"/"OFF", None = unbekannt).
+        # Leser bekommen diesen Wert ohne Serial-Roundtrip; der Reconciler
+        # gleicht ihn periodisch mit der Hardware ab.
+        self._states = {ch: None for ch in self.channel_names}
+        self._state_lock = threading.Lock()
+        self.drift_count = 0
+        self.last_drift = None
+        self._reconcile_stop = threading.Event()
+        self._reconcile_thread = None
 
-    def off(self):
-        self._send(b"\xA0\x01\x00\xA1")
-        self.log.add("Relay: OFF")
+        # Command-Queue: ein einziger Writer-Thread schreibt auf den Port.
+        # Befehle innerhalb von coalesce_ms werden zusammengefasst, pro Kanal
+        # wird nur der letzte Zustand geschrieben – alle Frames in einem write().
+        self.coalesce_s = max(0, coalesce_ms) / 1000.0
+        self._cmd_cond = threading.Condition()
+        self._pending = []          # [({kanal: state}, force, Future)]
+        # Befehle eingereiht / abgearbeitet: ungleich = Batch unterwegs (reconcile)
+        self._submitted = 0
+        self._completed = 0
+        self._written = {}          # kanal -> (state, monotonic) des letzten Writes
+        self._written_gen = None    # link.generation, auf der _written gilt
+        self._writer_stop = False
+        self.writes = 0
+        self.coalesced = 0
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+        self._writer.start()
 
-    def status(self) -> str:
+    def channel(self, ref) -> int:
+        """Kanal aus Nummer oder Name ("2", 2, "panel") auflösen."""
+        for ch, name in self.channel_names.items():
+            if str(ref).strip().lower() == name.lower():
+                return ch
         try:
-            with serial.Serial(self.device, baudrate=self.baudrate, timeout=1) as ser:
-                ser.reset_input_buffer()
-                ser.write(b"\xFF")
-                time.sleep(0.2)
-                resp = ser.read(64).decode(errors="ignore").strip()
-            if "ON" in resp:
-                return "ON"
-            if "OFF" in resp:
-                return "OFF"
-            return f"UNKNOWN ({resp})"
+            ch = int(ref)
+        except (TypeError, ValueError):
+            ch = None
+        if ch not in self.channel_names:
+            known = ", ".join(f"{c}={n}" for c, n in self.channel_names.items())
+            raise ValueError(f"Kanal {ref} existiert nicht ({known})")
+        return ch
+
+    def _submit(self, states: dict, force: bool = False) -> Future:
+        fut = Future()
+        with self._cmd_cond:
+            self._pending.append((states, force, fut))
+            self._submitted += 1
+            # Shadow-State sofort setzen (Leser sehen den gewünschten Zustand) –
+            # unter demselben Lock, damit seine Reihenfolge der Queue entspricht
+            with self._state_lock:
+                self._states.update(states)
+            self._cmd_cond.notify()
+        return fut
+
+    def _writer_loop(self):
+        while True:
+            with self._cmd_cond:
+                while not self._pending and not self._writer_stop:
+                    self._cmd_cond.wait()
+                if self._writer_stop and not self._pending:
+                    return
+
+            # kurz sammeln: ON/OFF-Paare und Touch-Stürme landen in einem Batch
+            if self.coalesce_s:
+                time.sleep(self.coalesce_s)
+
+            with self._cmd_cond:
+                batch, self._pending = self._pending, []
+
+            final = {}
+            for states, _, _ in batch:
+                final.update(states)
+            force = any(f for _, f, _ in batch)
+            self.coalesced += len(batch) - 1
+
+            try:
+                if self._written_gen != self._link.generation:
+                    self._written = {}
+                now = time.monotonic()
+                todo = {ch: st for ch, st in final.items() if force or not self._recent(ch, st, now)}
+                if todo:
+                    self._link.write(b"".join(frame(ch, st == "ON") for ch, st in sorted(todo.items())))
+                    self._written.update((ch, (st, now)) for ch, st in todo.items())
+                    self._written_gen = self._link.generation
+                    self.writes += 1
+                    self.log.add("Relay: " + ", ".join(self._label(ch, st) for ch, st in sorted(todo.items())))
+                for _, _, fut in batch:
+                    fut.set_result(final)
+            except Exception as e:
+                self._written = {}
+                with self._cmd_cond:
+                    superseded = set()
+                    for states, _, _ in self._pending:
+                        superseded.update(states)
+                with self._state_lock:
+                    for ch in final:
+                        if ch not in superseded:
+                            self._states[ch] = None
+                self.log.add(f"Relay: Schreibfehler ({e})")
+                for _, _, fut in batch:
+                    fut.set_exception(e)
+            finally:
+                with self._cmd_cond:
+                    self._completed += len(batch)
+
+    def _recent(self, ch: int, state: str, now: float) -> bool:
+        # state wurde eben erst auf ch geschrieben (innerhalb DEDUPE_S)
+        last = self._written.get(ch)
+        return last is not None and last[0] == state and now - last[1] < self.DEDUPE_S
+
+    def _label(self, ch: int, state: str) -> str:
+        if self.channels == 1:
+            return state
+        return f"{self.channel_names[ch]} {state}"
+
+    def on(self, force: bool = False) -> Future:
+        """Backlight EIN (asynchron über die Command-Queue)."""
+        return self._submit({self.BACKLIGHT: "ON"}, force=force)
+
+    def off(self, force: bool = False) -> Future:
+        """Backlight AUS (asynchron über die Command-Queue)."""
+        fut = self._submit({self.BACKLIGHT: "OFF"}, force=force)
+        with self._lock:
+            changed = self.force_on
+            self.force_on = False
+        if changed:
+            self._changed()
+        return fut
+
+    def set_channel(self, ref, on: bool) -> Future:
+        """Einzelnen Kanal schalten (Nummer oder Name)."""
+        return self.set_channels({ref: on})
+
+    def set_channels(self, states: dict) -> Future:
+        """
+        Mehrere Kanäle in einem Rutsch schalten, z. B. {"panel": True, "fan": False}.
+        Alle Frames gehen in einem einzigen write() raus. Das Backlight hängt an
+        Timer/force_on und geht nur über on()/off()/activate_for() (ValueError).
+        """
+        resolved = {self.channel(ref): ("ON" if on else "OFF") for ref, on in states.items()}
+        if self.BACKLIGHT in resolved:
+            raise ValueError(f"Kanal {self.channel_names[self.BACKLIGHT]} ist das Backlight "
+                             "(/relay/on|off bzw. relay_force_on)")
+        return self._submit(resolved)
+
+    def channel_states(self) -> dict:
+        """Shadow-State aller Kanäle als {name: "ON"/"OFF"/None}."""
+        with self._state_lock:
+            return {self.channel_names[ch]: st for ch, st in self._states.items()}
+
+    def add_listener(self, cb):
+        """cb() wird aufgerufen, wenn sich force_on oder die Ausschaltzeit ändert (Verlängerungen gedrosselt)."""
+        self._listeners.append(cb)
+
+    def _changed(self):
+        for cb in list(self._listeners):
+            try:
+                cb()
+            except Exception as e:
+                self.log.add(f"Relay: Listener Fehler: {e}")
+
+    def remaining_seconds(self):
+        """Sekunden bis zum Ausschalten (None = kein Timer aktiv)."""
+        r = self._scheduler.remaining(self._timer_key)
+        # aufrunden: 0 heißt für Clients "dauerhaft an" (force_on), nicht "letzte Sekunde"
+        return None if r is None else max(1, math.ceil(r))
+
+    def off_at(self):
+        """Geplante Ausschaltzeit als Unix-Timestamp (None = kein Timer aktiv)."""
+        if self._scheduler.deadline(self._timer_key) is None:
+            return None
+        return self._off_at
+
+    def queue_info(self):
+        with self._cmd_cond:
+            pending = len(self._pending)
+        return {"pending": pending, "writes": self.writes, "coalesced": self.coalesced}
+
+    def read_hardware_channels(self):
+        """Fragt alle Kanäle direkt beim Relais ab (0xFF, ~200 ms). Liefert (dict, Rohantwort)."""
+        resp = self._link.query(b"\xFF").decode(errors="ignore").strip()
+        return parse_status(resp, self.channels), resp
+
+    def read_hardware(self) -> str:
+        """Backlight-Zustand direkt vom Relais."""
+        try:
+            states, resp = self.read_hardware_channels()
+            return states.get(self.BACKLIGHT) or f"UNKNOWN ({resp})"
+        except Exception as e:
+            return f"ERROR ({e})"
+
+    def status(self, fresh: bool = False) -> str:
+        """
+        Liefert den Shadow-State des Backlights (ohne Serial-Zugriff).
+        fresh=True (oder Zustand noch unbekannt) erzwingt eine Hardware-Abfrage.
+        """
+        with self._state_lock:
+            state = self._states[self.BACKLIGHT]
+        if state is not None and not fresh:
+            return state
+        return self.reconcile()
+
+    def reconcile(self) -> str:
+        """Hardware abfragen, mit dem Shadow-State vergleichen, Abweichungen neu schalten."""
+        with self._cmd_cond:
+            seq = self._submitted
+        try:
+            hw, resp = self.read_hardware_channels()
         except Exception as e:
             return f"ERROR ({e})"
+        if not hw:
+            return f"UNKNOWN ({resp})"
+
+        with self._cmd_cond:
+            if self._submitted != seq or self._completed != self._submitted:
+                # Befehl eingereiht, vom Writer schon abgeholt oder während der Abfrage
+                # geschrieben -> Vergleich wäre nicht aussagekräftig
+                with self._state_lock:
+                    return self._states[self.BACKLIGHT] or hw.get(self.BACKLIGHT, "UNKNOWN")
+
+        drift = {}
+        with self._state_lock:
+            for ch, actual in hw.items():
+                expected = self._states.get(ch)
+                if expected is None:
+                    self._states[ch] = actual
+                elif expected != actual:
+                    drift[ch] = (expected, actual)
+            backlight = self._states[self.BACKLIGHT] or "UNKNOWN"
+
+        if drift:
+            self.drift_count += 1
+            self.last_drift = {
+                "channels": {self.channel_names[ch]: {"expected": e, "actual": a} for ch, (e, a) in drift.items()},
+                "ts": int(time.time()),
+            }
+            desc = ", ".join(f"{self.channel_names[ch]} soll {e} ist {a}" for ch, (e, a) in drift.items())
+            self.log.add(f"Relay: Drift erkannt ({desc}) -> erneut schalten")
+            self._submit({ch: e for ch, (e, _) in drift.items()}, force=True)
+        return backlight
+
+    def start_reconciler(self, interval: int):
+        """Gleicht den Shadow-State alle `interval` Sekunden mit der Hardware ab (0 = aus)."""
+        if interval <= 0:
+            return
+        if self._reconcile_thread and self._reconcile_thread.is_alive():
+            return
+
+        def _loop():
+            while not self._reconcile_stop.wait(interval):
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    self.log.add(f"Relay: Reconciler Fehler: {e}")
+
+        self._reconcile_thread = threading.Thread(target=_loop, daemon=True)
+        self._reconcile_thread.start()
+
+    def drift_info(self):
+        return {"drift_count": self.drift_count, "last_drift": self.last_drift}
+
+    def connected(self) -> bool:
+        return self._link.connected()
+
+    def close(self):
+        self._reconcile_stop.set()
+        self.cancel_timer()
+        with self._cmd_cond:
+            self._writer_stop = True
+            self._cmd_cond.notify()
+        self._writer.join(timeout=2)
+        self._worker.stop()
+        self._link.close()
 
     def activate_for(self, seconds: int, on_start=None, on_end=None):
         """Timer wird immer neu gesetzt."""
         with self._lock:
-            if self._timer and self._timer.is_alive():
-                self._timer.cancel()
-
             if on_start:
                 on_start()
 
-            self.on()
+            fut = self.on()
+
+            self._timer_seq += 1
+            seq = self._timer_seq
 
             def _end():
+                # Worker-Thread; inzwischen verlängert/abgebrochen -> nichts tun
+                with self._lock:
+                    if self._timer_seq != seq:
+                        return
+                    self._off_at = None
                 try:
                     self.off()
                 finally:
                     if on_end:
                         on_end()
+                    self._changed()
 
-            self._timer = threading.Timer(seconds, _end)
-            self._timer.start()
+            off_at = int(time.time() + seconds)
+            # neuer Timer bzw. Ende von force_on sofort melden, reine Verlängerung gedrosselt
+            started = self.force_on or self._off_at is None
+            moved = off_at != self._off_at
+            self.force_on = False
+            self._off_at = off_at
+            # Scheduler-Thread: nur weiterreichen
+            self._scheduler.schedule(self._timer_key, seconds,
+                                     lambda: self._worker.submit(self._timer_key, _end))
             self.log.add(f"Relay: aktiviert für {seconds}s")
+        if started:
+            self._changed()
+        elif moved:
+            self._changed_later()
+        return fut
+
+    def _changed_later(self):
+        # höchstens eine Benachrichtigung pro OFF_AT_NOTIFY_S; sie meldet den dann aktuellen Stand
+        if self._scheduler.deadline(self._notify_key) is None:
+            self._scheduler.schedule(self._notify_key, self.OFF_AT_NOTIFY_S, self._changed)
 
     def cancel_timer(self):
         with self._lock:
-            if self._timer and self._timer.is_alive():
-                self._timer.cancel()
-            self._timer = None
+            self._scheduler.cancel(self._timer_key)
+            self._timer_seq += 1
+            self._off_at = None
+        self._changed()
 
     def on_permanent(self, on_start=None):
         """Schaltet Relais dauerhaft EIN (ohne Timer)."""
         with self._lock:
             # Timer sicher weg, sonst geht er später wieder aus
-            if self._timer and self._timer.is_alive():
-                self._timer.cancel()
-            self._timer = None
+            self._scheduler.cancel(self._timer_key)
+            self._timer_seq += 1
+            self._off_at = None
+            self.force_on = True
 
         if on_start:
             on_start()
 
-        self.on()
+        fut = self.on()
         self.log.add("Relay: dauerhaft EIN (kein Timer)")
+        self._changed()
+        return fut
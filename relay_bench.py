@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Benchmark Relais-Pfad: Befehlsdurchsatz und Status-Latenz.
+
+Vergleicht
+  - open-per-call: serial.Serial() pro Befehl/Abfrage (altes Verhalten)
+  - pooled:        RelayController (persistente Verbindung + Command-Queue + Shadow-State)
+
+Ohne --device wird der pty-Simulator (relay_sim.py) gestartet, läuft also auf
+jeder Linux-Box ohne Board. Mit --max-status-ms (Hardware-Abfrage über den
+Port), --max-cached-status-ms / --min-cmd-rate wird der Exit-Code != 0, wenn
+die Schwelle gerissen wird (für CI).
+
+  python relay_bench.py -n 200 --latency-ms 2
+"""
+import argparse
+import statistics
+import sys
+import time
+
+import serial
+
+from relay import RelayController, frame
+from relay_sim import RelaySimulator
+
+
+class _QuietLog:
+    def add(self, msg: str):
+        pass
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _summary(name, samples_s):
+    ms = [x * 1000.0 for x in samples_s]
+    return {
+        "name": name,
+        "n": len(ms),
+        "mean_ms": round(statistics.mean(ms), 3) if ms else 0.0,
+        "p50_ms": round(_pct(ms, 0.50), 3),
+        "p95_ms": round(_pct(ms, 0.95), 3),
+        "p99_ms": round(_pct(ms, 0.99), 3),
+    }
+
+
+def bench_open_per_call(device, baudrate, n, status_n):
+    cmd = []
+    for i in range(n):
+        t0 = time.perf_counter()
+        with serial.Serial(device, baudrate=baudrate, timeout=1) as ser:
+            ser.write(frame(1, i % 2 == 0))
+        cmd.append(time.perf_counter() - t0)
+
+    st = []
+    for _ in range(status_n):
+        t0 = time.perf_counter()
+        with serial.Serial(device, baudrate=baudrate, timeout=1) as ser:
+            ser.reset_input_buffer()
+            ser.write(b"\xFF")
+            time.sleep(0.2)
+            ser.read(64)
+        st.append(time.perf_counter() - t0)
+    return cmd, st, []
+
+
+def bench_pooled(device, baudrate, n, status_n, coalesce_ms):
+    relay = RelayController(device, baudrate, _QuietLog(), coalesce_ms=coalesce_ms)
+    try:
+        relay.off().result(timeout=5)
+
+        cmd = []
+        for i in range(n):
+            t0 = time.perf_counter()
+            fut = relay.on() if i % 2 == 0 else relay.off()
+            fut.result(timeout=5)
+            cmd.append(time.perf_counter() - t0)
+
+        fresh = []
+        for _ in range(status_n):
+            t0 = time.perf_counter()
+            relay.status(fresh=True)
+            fresh.append(time.perf_counter() - t0)
+
+        cached = []
+        for _ in range(max(status_n, 1000)):
+            t0 = time.perf_counter()
+            relay.status()
+            cached.append(time.perf_counter() - t0)
+        return cmd, fresh, cached
+    finally:
+        relay.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Relais Benchmark (open-per-call vs. pooled)")
+    ap.add_argument("--device", default="", help="echtes Device; leer = pty-Simulator")
+    ap.add_argument("--baudrate", type=int, default=9600)
+    ap.add_argument("-n", type=int, default=100, help="Anzahl Schaltbefehle")
+    ap.add_argument("--status-n", type=int, default=10, help="Anzahl Hardware-Statusabfragen")
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Simulator-Latenz")
+    ap.add_argument("--coalesce-ms", type=int, default=5)
+    ap.add_argument("--skip-legacy", action="store_true")
+    ap.add_argument("--max-status-ms", type=float, default=0.0, help="p95 Schwelle Status (fresh, Serial)")
+    ap.add_argument("--max-cached-status-ms", type=float, default=0.0, help="p95 Schwelle Status (Shadow-State)")
+    ap.add_argument("--min-cmd-rate", type=float, default=0.0, help="Befehle/s Schwelle (pooled)")
+    args = ap.parse_args()
+
+    sim = None
+    device = args.device
+    if not device:
+        sim = RelaySimulator(latency=args.latency_ms / 1000.0, log=lambda m: None).start()
+        device = sim.device
+
+    results = []
+    rate = 0.0
+    status_p95 = 0.0
+    cached_p95 = 0.0
+    try:
+        if not args.skip_legacy:
+            cmd, st, _ = bench_open_per_call(device, args.baudrate, args.n, args.status_n)
+            results += [_summary("open-per-call cmd", cmd), _summary("open-per-call status", st)]
+
+        cmd, fresh, cached = bench_pooled(device, args.baudrate, args.n, args.status_n, args.coalesce_ms)
+        results += [
+            _summary("pooled cmd", cmd),
+            _summary("pooled status fresh", fresh),
+            _summary("pooled status cached", cached),
+        ]
+        rate = len(cmd) / sum(cmd) if cmd else 0.0
+        status_p95 = _pct([x * 1000.0 for x in fresh], 0.95)
+        cached_p95 = _pct([x * 1000.0 for x in cached], 0.95)
+    finally:
+        if sim:
+            sim.stop()
+
+    for r in results:
+        print(f"{r['name']:<24} n={r['n']:<5} mean={r['mean_ms']:>9.3f}ms "
+              f"p50={r['p50_ms']:>9.3f}ms p95={r['p95_ms']:>9.3f}ms p99={r['p99_ms']:>9.3f}ms")
+    print(f"pooled Durchsatz: {rate:.1f} Befehle/s")
+    if sim:
+        print(f"Simulator: frames={len(sim.frames)} queries={sim.queries} bad={sim.bad_frames}")
+
+    failed = False
+    if args.max_status_ms and status_p95 > args.max_status_ms:
+        print(f"FAIL: status fresh p95 {status_p95:.3f}ms > {args.max_status_ms}ms")
+        failed = True
+    if args.max_cached_status_ms and cached_p95 > args.max_cached_status_ms:
+        print(f"FAIL: status cached p95 {cached_p95:.3f}ms > {args.max_cached_status_ms}ms")
+        failed = True
+    if args.min_cmd_rate and rate < args.min_cmd_rate:
+        print(f"FAIL: {rate:.1f} Befehle/s < {args.min_cmd_rate}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
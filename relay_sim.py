@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Relais-Simulator (pty) – ersetzt das CH340/LCUS USB-Relais für Tests ohne Hardware.
+
+Spricht dasselbe Protokoll wie das Board:
+  A0 <kanal> <0|1> <checksumme>   -> Kanal schalten
+  FF                              -> Status ("ON"/"OFF" bzw. "CH1: ON\\r\\nCH2: OFF ...")
+
+Beispiel:
+  python relay_sim.py --link /tmp/ttyRELAY --channels 4 --latency-ms 20
+  DEVICE_RELAY=/tmp/ttyRELAY uvicorn api:app
+
+Fehlerinjektion:
+  --drop-rate     Anteil Frames, die ignoriert werden (Relais schaltet nicht)
+  --garbage-rate  Anteil Status-Antworten, die unbrauchbar sind
+  --hangup-every  alle N Sekunden "USB abziehen" (pty schließen, neu anlegen, Symlink umbiegen)
+"""
+import argparse
+import os
+import random
+import select
+import threading
+import time
+import tty
+
+
+class RelaySimulator:
+    def __init__(self, channels: int = 1, latency: float = 0.0, drop_rate: float = 0.0,
+                 garbage_rate: float = 0.0, link: str = "", log=print):
+        self.channels = max(1, min(8, channels))
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.garbage_rate = garbage_rate
+        self.link = link
+        self.log = log
+
+        self.states = {ch: False for ch in range(1, self.channels + 1)}
+        self.frames = []        # [(time.time(), kanal, an)] – empfangene Schaltbefehle
+        self.queries = 0
+        self.bad_frames = 0
+
+        self._master = None
+        self._slave = None
+        self.path = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def device(self) -> str:
+        """Pfad für DEVICE_RELAY (Symlink falls gesetzt, sonst /dev/pts/N)."""
+        return self.link or self.path
+
+    def _open_pty(self):
+        master, slave = os.openpty()
+        tty.setraw(slave)
+        self._master, self._slave = master, slave
+        self.path = os.ttyname(slave)
+        if self.link:
+            tmp = self.link + ".tmp"
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            os.symlink(self.path, tmp)
+            os.replace(tmp, self.link)
+
+    def _close_pty(self):
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._master = self._slave = None
+
+    def start(self):
+        self._open_pty()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+        self._close_pty()
+        if self.link:
+            try:
+                os.unlink(self.link)
+            except FileNotFoundError:
+                pass
+
+    def hangup(self, down_seconds: float = 1.0):
+        """Simuliert USB-Abziehen/-Einstecken: pty weg, kurz warten, neues pty unter gleichem Link."""
+        self._close_pty()
+        if self.link:
+            try:
+                os.unlink(self.link)
+            except FileNotFoundError:
+                pass
+        self.log(f"sim: hangup ({down_seconds}s)")
+        time.sleep(down_seconds)
+        self._open_pty()
+        self.log(f"sim: wieder da {self.device}")
+
+    def status_text(self) -> str:
+        if self.channels == 1:
+            return "ON" if self.states[1] else "OFF"
+        return "\r\n".join(f"CH{ch}: {'ON' if on else 'OFF'}" for ch, on in self.states.items())
+
+    def _reply(self, data: bytes):
+        try:
+            os.write(self._master, data)
+        except (OSError, TypeError):
+            pass
+
+    def _handle(self, buf: bytearray) -> bytearray:
+        while buf:
+            if buf[0] == 0xFF:
+                del buf[0]
+                self.queries += 1
+                if self.latency:
+                    time.sleep(self.latency)
+                if random.random() < self.garbage_rate:
+                    self._reply(b"\x00?\xfe")
+                else:
+                    self._reply(self.status_text().encode() + b"\r\n")
+                continue
+
+            if buf[0] != 0xA0:
+                del buf[0]
+                self.bad_frames += 1
+                continue
+
+            if len(buf) < 4:
+                break
+
+            _, ch, st, chk = buf[:4]
+            del buf[:4]
+            if chk != (0xA0 + ch + st) & 0xFF or ch not in self.states or st not in (0, 1):
+                self.bad_frames += 1
+                continue
+            if self.latency:
+                time.sleep(self.latency)
+            if random.random() < self.drop_rate:
+                continue
+            self.states[ch] = bool(st)
+            self.frames.append((time.time(), ch, bool(st)))
+        return buf
+
+    def _run(self):
+        buf = bytearray()
+        while not self._stop.is_set():
+            master = self._master
+            if master is None:
+                time.sleep(0.05)
+                continue
+            try:
+                r, _, _ = select.select([master], [], [], 0.2)
+                if not r:
+                    continue
+                data = os.read(master, 256)
+            except OSError:
+                # pty gerade ersetzt (hangup) oder Gegenstelle zu
+                time.sleep(0.05)
+                continue
+            buf.extend(data)
+            buf = self._handle(buf)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="USB-Relais Simulator (pty)")
+    ap.add_argument("--link", default="/tmp/ttyRELAY", help="Symlink auf das pty (für DEVICE_RELAY)")
+    ap.add_argument("--channels", type=int, default=1)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="Antwort-/Schaltverzögerung")
+    ap.add_argument("--drop-rate", type=float, default=0.0)
+    ap.add_argument("--garbage-rate", type=float, default=0.0)
+    ap.add_argument("--hangup-every", type=float, default=0.0, help="Sekunden, 0 = nie")
+    args = ap.parse_args()
+
+    sim = RelaySimulator(
+        channels=args.channels,
+        latency=args.latency_ms / 1000.0,
+        drop_rate=args.drop_rate,
+        garbage_rate=args.garbage_rate,
+        link=args.link,
+    ).start()
+    print(f"Relais-Simulator läuft: {sim.path} (DEVICE_RELAY={sim.device}), {sim.channels} Kanal/Kanäle")
+
+    try:
+        last = time.time()
+        while True:
+            time.sleep(0.5)
+            if args.hangup_every and time.time() - last >= args.hangup_every:
+                sim.hangup()
+                last = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sim.stop()
+        print(f"frames={len(sim.frames)} queries={sim.queries} bad={sim.bad_frames}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,283 @@
+import math
 import subprocess
-import signal
 import time
 import threading
-import os
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from scheduler import DeadlineScheduler, Worker
+from display_ctl import DEFAULT_GEOMETRY
+from proc_supervisor import ProcessSupervisor
+
+MODES = ("normal", "crop", "stretch")
+LAYOUTS = ("grid", "pip")
+
+
+def _even(x) -> int:
+    return int(x) // 2 * 2
+
+
+def crop_box(src, w: int, h: int):
+    """Größter mittiger Ausschnitt von src=(sw, sh) im Seitenverhältnis w:h."""
+    sw, sh = src
+    if sw * h > sh * w:
+        # Quelle breiter als das Ziel -> links/rechts abschneiden
+        return min(sw, _even(sh * w / h)), sh
+    return sw, min(sh, _even(sw * h / w))
+
+
+def mode_props(mode: str, src=None, screen=DEFAULT_GEOMETRY):
+    """
+    Bildmodus -> (vf, keepaspect) für mpv (Kommandozeile oder set_property).
+
+    Skaliert wird nur im VO (GPU, --fs); als CPU-Filter bleibt höchstens ein
+    crop. Mit bekannter Quellgröße src=(w, h) (StreamProbeCache) wird der
+    Ausschnitt exakt berechnet und entfällt, wenn die Quelle schon das
+    Seitenverhältnis des Bildschirms hat.
+    """
+    w, h = screen
+    if mode == "crop":
+        if src is None:
+            # Größe noch unbekannt: größter mittiger Ausschnitt im Bildschirm-Seitenverhältnis
+            # (wie crop_box(), ffmpeg rechnet ihn aus iw/ih); [..] quotet die Kommas für mpvs --vf-Liste
+            return f"crop=[min(iw,ih*{w}/{h})]:[min(ih,iw*{h}/{w})]", True
+        cw, ch = crop_box(src, w, h)
+        if abs(cw - src[0]) <= 2 and abs(ch - src[1]) <= 2:
+            return "", True
+        return f"crop={cw}:{ch}", True
+    if mode == "stretch":
+        # --no-keepaspect: der VO streckt auf Vollbild
+        return "", False
+    return "", True
+
+
+def tile_filter(mode: str, w: int, h: int, src=None) -> str:
+    """
+    Bildmodus für eine Kachel; Ergebnis ist immer genau w x h (für xstack/overlay).
+    Mit bekannter Quellgröße wird vor dem Skalieren gecroppt und ein Scale
+    auf die eigene Größe weggelassen.
+    """
+    if src is not None:
+        sw, sh = src
+        if mode == "crop":
+            cw, ch = crop_box(src, w, h)
+            chain = [] if (cw, ch) == (sw, sh) else [f"crop={cw}:{ch}"]
+            if (cw, ch) != (w, h):
+                chain.append(f"scale={w}:{h}")
+            return ",".join(chain + ["setsar=1"])
+        if mode == "stretch":
+            return "setsar=1" if (sw, sh) == (w, h) else f"scale={w}:{h},setsar=1"
+        # normal: einpassen, Rest schwarz
+        if sw * h > sh * w:
+            fw, fh = w, min(h, _even(sh * w / sw))
+        else:
+            fw, fh = min(w, _even(sw * h / sh)), h
+        chain = [] if (fw, fh) == (sw, sh) else [f"scale={fw}:{fh}"]
+        if (fw, fh) != (w, h):
+            chain.append(f"pad={w}:{h}:(ow-iw)/2:(oh-ih)/2")
+        return ",".join(chain + ["setsar=1"])
+
+    if mode == "stretch":
+        return f"scale={w}:{h},setsar=1"
+    if mode == "crop":
+        return f"scale={w}:{h}:force_original_aspect_ratio=increase,crop={w}:{h},setsar=1"
+    return f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2,setsar=1"
+
+
+def grid_shape(n: int, screen=DEFAULT_GEOMETRY, src_aspect: float = 16 / 9):
+    """(cols, rows) mit der meisten genutzten Fläche für n Quellen im Seitenverhältnis src_aspect."""
+    w, h = screen
+    best = (1, n)
+    best_score = -1.0
+    for cols in range(1, n + 1):
+        rows = math.ceil(n / cols)
+        tile_aspect = (w / cols) / (h / rows)
+        fill = min(tile_aspect, src_aspect) / max(tile_aspect, src_aspect)
+        score = fill * n / (cols * rows)
+        if score > best_score:
+            best, best_score = (cols, rows), score
+    return best
+
+
+def layout_graph(layout: str, modes, screen=DEFAULT_GEOMETRY, sources=None) -> str:
+    """
+    lavfi-complex für mehrere Quellen in einem mpv: [vid1] ist die per
+    loadfile geladene URL, [vid2].. kommen aus external-files.
+    sources: bekannte Quellgrößen pro Kachel ((w, h) oder None).
+
+      grid  Kacheln (xstack), Aufteilung nach grid_shape()
+      pip   erste Quelle Vollbild, weitere klein unten rechts übereinander
+    """
+    n = len(modes)
+    w, h = screen
+    src = list(sources or []) + [None] * n
+    parts = []
+    if layout == "pip":
+        pw = _even(min(w, h) * 0.4)
+        ph = _even(pw * 9 / 16)
+        margin = _even(min(w, h) * 0.02)
+        parts.append(f"[vid1] {tile_filter(modes[0], w, h, src[0])} [t0]")
+        for i in range(1, n):
+            parts.append(f"[vid{i + 1}] {tile_filter(modes[i], pw, ph, src[i])} [t{i}]")
+        prev = "t0"
+        for i in range(1, n):
+            x = w - pw - margin
+            y = h - i * (ph + margin)
+            out = "vo" if i == n - 1 else f"o{i}"
+            parts.append(f"[{prev}] [t{i}] overlay={x}:{y}:eof_action=pass [{out}]")
+            prev = out
+        return "; ".join(parts)
+
+    known = [s for s in src[:n] if s]
+    cols, rows = grid_shape(n, screen, known[0][0] / known[0][1]) if known else grid_shape(n, screen)
+    tw, th = _even(w / cols), _even(h / rows)
+    for i in range(n):
+        parts.append(f"[vid{i + 1}] {tile_filter(modes[i], tw, th, src[i])} [t{i}]")
+    pos = "|".join(f"{(i % cols) * tw}_{(i // cols) * th}" for i in range(n))
+    fill = ":fill=black" if n < cols * rows else ""
+    parts.append("".join(f"[t{i}] " for i in range(n)) + f"xstack=inputs={n}:layout={pos}{fill} [vo]")
+    return "; ".join(parts)
+
+
+class RtspStandby:
+    """
+    Warm-Standby für die Standardkamera (RTSP_DEFAULT_URL).
+
+    Ein zweiter mpv (eigenes MpvIpc) hält die RTSP-Session zu `url` offen und
+    dekodiert das Video in einen Null-VO (vo=null, aid=no): kein Fenster, kein
+    GPU-Kontext. Ohne ausgewählte Spur würde mpv die Wiedergabe sofort beenden
+    (end-file error). activate() schaltet nur den VO auf gpu -> DESCRIBE/SETUP/PLAY,
+    Decoder-Init und Warten auf den Keyframe entfallen, es bleibt die Fenster-Init.
+
+    Alle `interval` Sekunden prüft pressure(paused) (Temperatur/Last); liefert
+    es einen Grund, wird der Standby-mpv beendet und erst ohne Druck wieder
+    aufgebaut (paused=True erlaubt dem Aufrufer eine Hysterese). Die Deadline
+    stößt die Prüfung nur an; Prüfung und Verbindungsaufbau (mpv-Start, IPC)
+    laufen auf einem eigenen Worker-Thread.
+    """
+
+    def __init__(self, mpv, url: str, log, scheduler, pressure=None, interval: float = 10.0):
+        self.mpv = mpv
+        self.url = url
+        self.log = log
+        self._scheduler = scheduler
+        self._pressure = pressure or (lambda paused: None)
+        self.interval = interval
+        self._key = "rtsp-standby"
+        self._worker = Worker(log, "RTSP Standby")
+        self._active = False
+        self.paused_reason = None
+        self.connects = 0
+        self.hits = 0
+
+        mpv.on_event("end-file", self._on_end_file)
+
+    def start(self):
+        # erster Verbindungsaufbau im Hintergrund, blockiert den Startup nicht
+        self._scheduler.schedule(self._key, 0, self._tick)
+
+    def stop(self):
+        self._scheduler.cancel(self._key)
+        self._worker.stop()
+        self.mpv.close()
+
+    def _tick(self):
+        # Scheduler-Thread: nur weiterreichen
+        self._worker.submit(self._key, self._check)
+
+    def ready(self) -> bool:
+        return not self._active and self.mpv.showing("standby")
+
+    def _connect(self):
+        try:
+            self.mpv.ensure()
+            self.mpv.set_property("vo", "null")
+            self.mpv.set_property("aid", "no")
+            self.mpv.load(self.url, owner="standby")
+            self.connects += 1
+            self.log.add(f"RTSP: Standby verbunden {self.url}")
+        except Exception as e:
+            self.log.add(f"RTSP: Standby Fehler: {e}")
+
+    def _check(self):
+        try:
+            reason = self._pressure(self.paused_reason is not None)
+            if reason and not self._active:
+                if self.paused_reason is None:
+                    self.log.add(f"RTSP: Standby aus ({reason})")
+                    self.mpv.close()
+                self.paused_reason = reason
+            elif not reason:
+                if self.paused_reason is not None:
+                    self.log.add("RTSP: Standby wieder an")
+                    self.paused_reason = None
+                if not self._active and not self.mpv.showing("standby"):
+                    self._connect()
+        finally:
+            self._scheduler.schedule(self._key, self.interval, self._tick)
+
+    def activate(self, vf: str, keepaspect: bool) -> bool:
+        """Standby sichtbar machen (VO an, wie MpvIpc.ARGS); False wenn nicht bereit."""
+        if not self.ready():
+            return False
+        try:
+            self.mpv.set_property("vf", vf)
+            self.mpv.set_property("keepaspect", keepaspect)
+            self.mpv.set_property("vo", "gpu")
+        except Exception as e:
+            self.log.add(f"RTSP: Standby aktivieren fehlgeschlagen: {e}")
+            return False
+        self.mpv.owner = "rtsp"
+        self._active = True
+        self.hits += 1
+        return True
+
+    def release(self):
+        """Zurück in den Standby (Null-VO, Fenster schließt, Verbindung und Decoder bleiben)."""
+        self._active = False
+        if not self.mpv.showing("rtsp"):
+            return
+        try:
+            self.mpv.set_property("vo", "null")
+            self.mpv.set_property("vf", "")
+            self.mpv.owner = "standby"
+        except Exception as e:
+            self.log.add(f"RTSP: Standby zurücksetzen fehlgeschlagen: {e}")
+            self.mpv.owner = None
+
+    def _on_end_file(self, ev):
+        # Reader-Thread: nur Zustand zurücksetzen, _check() verbindet neu
+        if ev.get("reason") in ("error", "eof") and self.mpv.showing("standby"):
+            self.mpv.owner = None
+            self.log.add(f"RTSP: Standby getrennt ({ev.get('file_error', ev.get('reason'))})")
+
+    def info(self):
+        return {
+            "url": self.url,
+            "ready": self.ready(),
+            "active": self._active,
+            "paused": self.paused_reason,
+            "connects": self.connects,
+            "hits": self.hits,
+        }
 
 
 class RtspPlayer:
-    def __init__(self, display_ctl, overlay, relay, log, log_path: str):
+    """
+    RTSP-Anzeige in mpv (gemeinsamer MpvIpc oder eigener Prozess).
+
+    Watchdog (stall_budget > 0): solange ein Stream läuft, liest ein
+    Tick (Scheduler-Deadline, ausgeführt auf dem Worker-Thread) Frame-Zähler
+    und time-pos über IPC. Bewegt sich beides `stall_budget` Sekunden nicht
+    (Kamera hängt, Bild eingefroren) oder bricht der Stream ab, wird neu
+    verbunden. Jeder Versuch bekommt mindestens `stall_budget`, danach Backoff
+    (2 s, 4 s ... bis `reconnect_max`), zurückgesetzt sobald wieder Frames
+    kommen. Der Timer läuft dabei weiter. Ohne IPC wird nur das Prozessende
+    erkannt.
+    """
+
+    def __init__(self, display_ctl, overlay, relay, log, log_path: str, scheduler=None, mpv=None,
+                 supervisor=None, standby=None, stall_budget: float = 4.0, reconnect_max: float = 30.0,
+                 probe=None):
         self.display_ctl = display_ctl
         self.overlay = overlay
         self.relay = relay
@@ -15,41 +286,110 @@ class RtspPlayer:
 
         self._lock = threading.Lock()
         self._proc = None
-        self._timer = None
+        self._scheduler = scheduler or DeadlineScheduler(log)
+        self._sup = supervisor or ProcessSupervisor(log, self._scheduler)
+        self._timer_key = "rtsp"
+        self._arm_seq = 0   # erhöht bei _arm()/stop_only() -> veraltete Abläufe erkennen
         self._url = None
         self._end_ts = None
         self._mode = "normal"
+        # Mehrfachansicht: Layout ("grid"/"pip"), alle URLs und Modus pro Kachel
+        self._layout = None
+        self._urls = []
+        self._tile_modes = []
+        # StreamProbeCache: Quellgröße pro URL -> minimale Filterkette
+        self._probe = probe
+        self._applied = None  # (vf, keepaspect) des laufenden Einzelstreams
+        # Bildschirm gedreht/anderes Panel -> Filter neu berechnen
+        display_ctl.on_geometry_change(self._on_geometry)
+
+        # gemeinsamer mpv (MpvIpc): Stream per loadfile statt eigenem Prozess
+        self._mpv = mpv
+        if mpv is not None:
+            mpv.on_event("end-file", self._on_end_file)
+            mpv.on_event("ipc-lost", self._kick_watchdog)
+            mpv.on_event("video-reconfig", self._on_video_reconfig)
+        # optionaler Warm-Standby (RtspStandby) für die Standardkamera
+        self._standby = standby if mpv is not None else None
+        if self._standby is not None:
+            self._standby.mpv.on_event("end-file", self._on_end_file)
+            self._standby.mpv.on_event("ipc-lost", self._kick_watchdog)
+            self._standby.mpv.on_event("video-reconfig", self._on_video_reconfig)
+        self._player = None   # MpvIpc, der gerade den Stream zeigt (_mpv oder Standby)
+
+        # Watchdog
+        self.stall_budget = stall_budget
+        self.reconnect_max = reconnect_max
+        self._wd_key = "rtsp-watchdog"
+        # blockierende IPC-Arbeit (Watchdog, Reconnect, Quellgröße) nicht auf dem Scheduler-Thread
+        self._worker = Worker(log, "RTSP")
+        self._wd_frame = None
+        self._wd_pos = None
+        self._wd_ts = 0.0
+        self._progress_ts = 0.0   # letzter Fortschritt bzw. Reconnect-Versuch
+        self._stall_ts = 0.0      # Beginn des aktuellen Hängers
+        self._next_reconnect = 0.0
+        self._backoff = 0
+        self._stalled = False
+        self._fps = None
+        self.reconnects = 0
+        self.stalls = 0
+        self.stall_total = 0.0
 
     def _kill_group(self, proc, name: str):
+        # asynchron: SIGTERM jetzt, SIGKILL später über den Supervisor – der Lock wird nicht gehalten
         if not proc or proc.poll() is not None:
             return
-        try:
-            os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-            for _ in range(30):
-                if proc.poll() is not None:
-                    break
-                time.sleep(0.05)
-            if proc.poll() is None:
-                os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-            self.log.add(f"{name}: beendet")
-        except Exception as e:
-            self.log.add(f"{name}: kill Fehler: {e}")
+        self._sup.terminate(proc, name)
 
     def start(self, url: str, seconds: int, mode: str = "normal", after_done=None):
         """
         Startet RTSP Stream in mpv.
         mode:
           - normal: keine Skalierung/Crop
-          - crop:   Höhe auf 1920 skalieren und mittig auf 1080x1920 croppen (ohne Verzerrung)
-          - stretch: auf 1080x1920 strecken (verzerrt)
+          - crop:   mittig auf das Seitenverhältnis des Bildschirms croppen (ohne Verzerrung)
+          - stretch: auf Vollbild strecken (verzerrt)
+        Skaliert wird im VO (GPU); siehe mode_props().
         """
         if seconds <= 0:
             seconds = 300
 
         mode = (mode or "normal").lower().strip()
-        if mode not in ("normal", "crop", "stretch"):
+        if mode not in MODES:
             mode = "normal"
 
+        return self._start(url, seconds, mode, after_done)
+
+    def start_layout(self, urls, seconds: int, layout: str = "grid", modes=None, after_done=None):
+        """
+        Mehrere Kameras in einem mpv/Fenster (lavfi-complex statt N Prozessen).
+        layout: grid | pip; modes: ein Modus oder Liste pro URL (normal/crop/stretch).
+        """
+        urls = [u for u in (urls or []) if u]
+        if seconds <= 0:
+            seconds = 300
+        if isinstance(modes, str) or modes is None:
+            modes = [modes or "normal"]
+        modes = [(m or "normal").lower().strip() for m in modes]
+        modes = [m if m in MODES else "normal" for m in modes]
+        # fehlende Modi: letzter gilt weiter
+        modes = (modes + [modes[-1]] * len(urls))[:len(urls)]
+
+        if len(urls) < 2:
+            return self.start(urls[0], seconds, mode=modes[0], after_done=after_done) if urls else False
+        if layout not in LAYOUTS:
+            layout = "grid"
+        return self._start(urls[0], seconds, modes[0], after_done, layout=layout, urls=urls, modes=modes)
+
+    def _start(self, url: str, seconds: int, mode: str, after_done, layout=None, urls=(), modes=()):
+        if self._mpv is not None:
+            return self._start_ipc(url, seconds, mode, after_done, layout, urls, modes)
+
+        # ohne IPC meldet mpv keine Quellgröße -> ffprobe im Hintergrund, greift ab dem nächsten Start
+        if self._probe is not None:
+            for u in urls or [url]:
+                self._probe.refresh(u)
+
         with self._lock:
             # vorherigen Stream beenden
             self._kill_group(self._proc, "RTSP")
@@ -59,45 +399,8 @@ class RtspPlayer:
             self.display_ctl.wake()
             self.overlay.hide()
 
-            cmd = [
-                "mpv",
-                "--no-terminal",
-                "--fs",
-                "--ontop",
-                "--no-osc",
-                "--vo=gpu",
-                "--rtsp-transport=tcp",
-                "--profile=low-latency",
-                "--cache=no",
-            ]
-
-            # Bildmodus
-            if mode == "crop":
-                cmd += ["--vf=scale=-2:1920,crop=1080:1920:(iw-1080)/2:(ih-1920)/2"]
-            elif mode == "stretch":
-                cmd += ["--vf=scale=1080:1920", "--no-keepaspect"]
-
-            cmd.append(url)
-
-            # Kopfzeile ins Log
-            try:
-                with open(self.log_path, "a", buffering=1) as f:
-                    env = self.display_ctl.env()
-                    f.write(f"\n--- {time.strftime('%F %T')} START ---\n")
-                    f.write("CMD: " + " ".join(cmd) + "\n")
-                    f.write(f"DISPLAY={env.get('DISPLAY')} XAUTHORITY={env.get('XAUTHORITY','')}\n")
-            except Exception:
-                pass
-
             try:
-                logf = open(self.log_path, "a", buffering=1)
-                self._proc = subprocess.Popen(
-                    cmd,
-                    env=self.display_ctl.env(),
-                    stdout=logf,
-                    stderr=logf,
-                    start_new_session=True
-                )
+                self._proc = self._spawn(url, mode, layout, urls, modes)
             except FileNotFoundError:
                 self.log.add("RTSP: mpv nicht gefunden (installiere mpv).")
                 self._proc = None
@@ -114,78 +417,550 @@ class RtspPlayer:
                 return False
 
             self._url = url
-            self._end_ts = time.time() + seconds
+            self._end_ts = time.monotonic() + seconds
             self._mode = mode
+            self._set_layout(layout, urls, modes)
 
-            self.log.add(f"RTSP: start {url} für {seconds}s mode={mode} (log {self.log_path})")
+            self.log.add(f"RTSP: start {self._describe()} für {seconds}s (log {self.log_path})")
+            proc = self._proc
+            exited = self._sup.watch(proc, "RTSP")
+
+        # sofortige Beendigung erkennen – ohne Lock, running()/info() bleiben erreichbar
+        try:
+            rc = exited.result(timeout=0.3)
+        except FutureTimeout:
+            rc = None
 
-            # sofortige Beendigung erkennen
-            time.sleep(0.3)
-            rc = self._proc.poll()
+        with self._lock:
+            if self._proc is not proc:
+                # inzwischen gestoppt oder neu gestartet
+                return False
             if rc is not None:
                 self.log.add(f"RTSP: sofort beendet rc={rc} (siehe {self.log_path})")
                 self._proc = None
                 self._url = None
                 self._end_ts = None
                 self._mode = "normal"
+                self._set_layout(None, (), ())
                 return False
 
-            # Relay passend zur Dauer
-            self.relay.activate_for(seconds)
+            self._arm(seconds, after_done)
+            self._watch_begin()
+            return True
+
+    def _set_layout(self, layout, urls, modes):
+        self._layout = layout
+        self._urls = list(urls) if layout else []
+        self._tile_modes = list(modes) if layout else []
+
+    def _describe(self) -> str:
+        if self._layout:
+            return f"{self._layout} {', '.join(self._urls)} modes={','.join(self._tile_modes)}"
+        return f"{self._url} mode={self._mode}"
+
+    def _spawn(self, url: str, mode: str, layout=None, urls=(), modes=()):
+        """Eigener mpv-Prozess für url bzw. Layout (MPV_IPC=0)."""
+        cmd = [
+            "mpv",
+            "--no-terminal",
+            "--fs",
+            "--ontop",
+            "--no-osc",
+            "--vo=gpu",
+            "--rtsp-transport=tcp",
+            "--profile=low-latency",
+            "--cache=no",
+        ]
+
+        if layout:
+            cmd += [f"--lavfi-complex={self._graph(layout, urls, modes)}"]
+            cmd += [f"--external-file={u}" for u in urls[1:]]
+        else:
+            # Bildmodus
+            vf, keepaspect = self._props(url, mode)
+            if vf:
+                cmd += [f"--vf={vf}"]
+            if not keepaspect:
+                cmd += ["--no-keepaspect"]
+
+        cmd.append(url)
+
+        # Kopfzeile ins Log
+        try:
+            with open(self.log_path, "a", buffering=1) as f:
+                env = self.display_ctl.env()
+                f.write(f"\n--- {time.strftime('%F %T')} START ---\n")
+                f.write("CMD: " + " ".join(cmd) + "\n")
+                f.write(f"DISPLAY={env.get('DISPLAY')} XAUTHORITY={env.get('XAUTHORITY','')}\n")
+        except Exception:
+            pass
+
+        with open(self.log_path, "a", buffering=1) as logf:
+            return subprocess.Popen(
+                cmd,
+                env=self.display_ctl.env(),
+                stdout=logf,
+                stderr=logf,
+                start_new_session=True
+            )
 
-            # Timer neu
-            if self._timer and self._timer.is_alive():
-                self._timer.cancel()
+    def _arm(self, seconds: int, after_done):
+        # unter self._lock; Relay passend zur Dauer
+        self.relay.activate_for(seconds)
+        self._arm_seq += 1
+        seq = self._arm_seq
 
-            def _finish():
-                # Stream stoppen
-                self.stop_only()
+        def _finish():
+            # Worker-Thread; inzwischen neu gestartet/gestoppt -> nichts tun
+            with self._lock:
+                if self._arm_seq != seq:
+                    return
 
-                # Idle nach Ablauf: Relais OFF + Schwarz
-                self.relay.off()
-                self.overlay.show()
-                self.log.add("RTSP: fertig -> idle (relay off + black)")
-                if after_done:
-                    after_done()
+            # Stream stoppen
+            self.stop_only()
 
-            self._timer = threading.Timer(seconds, _finish)
-            self._timer.start()
+            # Idle nach Ablauf: Relais OFF + Schwarz
+            self.relay.off()
+            self.overlay.show()
+            self.log.add("RTSP: fertig -> idle (relay off + black)")
+            if after_done:
+                after_done()
 
+        # Timer neu (ersetzt eine evtl. noch laufende Deadline); Scheduler-Thread reicht nur weiter
+        self._scheduler.schedule(self._timer_key, seconds,
+                                 lambda: self._worker.submit(self._timer_key, _finish))
+
+    def _start_ipc(self, url: str, seconds: int, mode: str, after_done, layout=None, urls=(), modes=()):
+        # Wake und mpv-Start (bis 5 s) ohne self._lock, damit info()/stop_only() nicht
+        # warten; entschieden wird erst unter dem Lock anhand des dann laufenden Streams
+        self.display_ctl.wake()
+        sb = self._standby
+        ensure_err = None
+        if sb is None or layout or url != sb.url or not (sb.ready() or self._player is sb.mpv):
+            try:
+                self._mpv.ensure()
+            except Exception as e:
+                ensure_err = e
+
+        with self._lock:
+            vf, keepaspect = self._props(url, mode)
+            prev = self._player
+
+            if self._alive() and not layout and not self._layout and url == self._url:
+                # gleicher Stream läuft schon: kein Reconnect
+                if mode != self._mode:
+                    # nur Bildmodus live umschalten, Restzeit bleibt
+                    return self._apply_mode(mode)
+                # gleicher Modus = Verlängerung
+                self._end_ts = time.monotonic() + seconds
+                self.log.add(f"RTSP: {url} läuft bereits, Timer neu {seconds}s")
+                self._arm(seconds, after_done)
+                return True
+
+            if (sb is not None and not layout and not self._layout and url == sb.url
+                    and (prev is sb.mpv or sb.activate(vf, keepaspect))):
+                if prev is sb.mpv:
+                    self._set_mode_props(sb.mpv, vf, keepaspect)
+                self._applied = (vf, keepaspect)
+                player, how = sb.mpv, "Standby"
+            else:
+                try:
+                    if ensure_err is not None:
+                        raise ensure_err
+                    # läuft normalerweise schon (s. o.); nur falls der Standby doch nicht bereit war
+                    self._mpv.ensure()
+                    # ersetzt Overlay bzw. vorherigen Stream im selben Fenster
+                    self._load(self._mpv, url, mode, layout, urls, modes)
+                except Exception as e:
+                    self.log.add(f"RTSP: Startfehler: {e}")
+                    self._release_player()
+                    self._url = None
+                    self._end_ts = None
+                    self._mode = "normal"
+                    self._set_layout(None, (), ())
+                    return False
+                player, how = self._mpv, "mpv IPC"
+
+            # vorherigen Stream im jeweils anderen mpv beenden
+            if prev is not None and prev is not player:
+                self._release_player()
+            self._player = player
+
+            # Overlay läuft evtl. nicht im selben mpv (sonst No-op)
+            self.overlay.hide()
+
+            self._url = url
+            self._end_ts = time.monotonic() + seconds
+            self._mode = mode
+            self._set_layout(layout, urls, modes)
+            self.log.add(f"RTSP: start {self._describe()} für {seconds}s ({how})")
+
+            self._arm(seconds, after_done)
+            self._watch_begin()
             return True
 
+    def _load(self, player, url: str, mode: str, layout=None, urls=(), modes=()):
+        """Props für Einzelstream bzw. Layout setzen und url laden (unter self._lock)."""
+        leaving = self._layout is not None and player is self._player
+        if (layout or leaving) and player.path is not None:
+            # lavfi-complex/external-files greifen erst beim nächsten loadfile;
+            # zur Laufzeit geändert würde mpv den Graphen auf die alte Datei anwenden
+            player.command("stop")
+        if layout:
+            self._set_mode_props(player, "", True)
+            player.set_property("external-files", list(urls[1:]))
+            player.set_property("lavfi-complex", self._graph(layout, urls, modes))
+        else:
+            if leaving:
+                self._clear_layout_props(player)
+            props = self._props(url, mode)
+            self._set_mode_props(player, *props)
+            self._applied = props
+        player.load(url, owner="rtsp")
+
+    def _size(self, url: str):
+        return self._probe.size(url) if self._probe is not None else None
+
+    def _props(self, url: str, mode: str):
+        return mode_props(mode, self._size(url), self.display_ctl.geometry())
+
+    def _graph(self, layout: str, urls, modes) -> str:
+        return layout_graph(layout, modes, screen=self.display_ctl.geometry(),
+                            sources=[self._size(u) for u in urls])
+
+    # ---------- Quellgröße lernen ----------
+
+    def _on_video_reconfig(self, ev):
+        # Reader-Thread: keine Kommandos hier, Abfrage auf dem Worker-Thread
+        if self._probe is not None and self._url is not None:
+            self._worker.submit("rtsp-probe", self._learn_source)
+
+    def _learn_source(self):
+        """Größe/Codec/fps aller Videospuren in den Cache; Einzelstream: Filter auf exakten Crop umstellen."""
+        with self._lock:
+            player, url = self._player, self._url
+        if player is None or url is None or not player.showing("rtsp"):
+            return
+        for t in player.get_property("track-list", [], timeout=0.5) or []:
+            if t.get("type") != "video" or not t.get("demux-w"):
+                continue
+            # Layout: weitere Quellen sind external-files
+            self._probe.put(t.get("external-filename") or url, t.get("demux-w"), t.get("demux-h"),
+                            t.get("codec"), t.get("demux-fps"))
+
+        with self._lock:
+            if self._url != url or self._layout or self._player is not player:
+                return
+            self._refresh_props()
+
+    def _on_geometry(self, size):
+        # Reactor-Thread: Kommandos auf dem Worker-Thread
+        if self._url is not None:
+            self._worker.submit("rtsp-geometry", self._geometry_changed)
+
+    def _geometry_changed(self):
+        with self._lock:
+            if self._url is None or self._player is None or not self._player.showing("rtsp"):
+                return
+            if not self._layout:
+                self._refresh_props()
+                return
+            # Kachelgrößen stecken im lavfi-complex -> neu laden
+            try:
+                self._load(self._player, self._url, self._mode, self._layout, self._urls, self._tile_modes)
+                self.log.add(f"RTSP: {self._layout} für {self.display_ctl.geometry()} neu geladen")
+            except Exception as e:
+                self.log.add(f"RTSP: Layout neu laden fehlgeschlagen: {e}")
+
+    def _refresh_props(self):
+        # unter self._lock: vf/keepaspect des Einzelstreams an Quell-/Bildschirmgröße anpassen
+        props = self._props(self._url, self._mode)
+        if props == self._applied:
+            return
+        try:
+            self._set_mode_props(self._player, *props)
+        except Exception as e:
+            self.log.add(f"RTSP: Filter anpassen fehlgeschlagen: {e}")
+            return
+        self._applied = props
+        self.log.add(f"RTSP: Filter neu vf={props[0] or '-'} keepaspect={props[1]}")
+
+    @staticmethod
+    def _clear_layout_props(mpv):
+        mpv.set_property("lavfi-complex", "")
+        mpv.set_property("external-files", [])
+
+    # ---------- Watchdog ----------
+
+    def _watch_begin(self):
+        # unter self._lock: neuer Stream -> Zähler pro Stream zurück, erster Tick nach dem Intervall
+        now = time.monotonic()
+        self._wd_frame = self._wd_pos = None
+        self._wd_ts = now
+        self._progress_ts = now   # Verbindungsaufbau bekommt das volle Budget
+        self._next_reconnect = 0.0
+        self._backoff = 0
+        self._stalled = False
+        self._fps = None
+        if self.stall_budget > 0:
+            self._scheduler.schedule(self._wd_key, self._wd_interval(), self._wd_tick)
+
+    def _wd_interval(self) -> float:
+        return min(1.0, self.stall_budget / 2)
+
+    def _wd_tick(self):
+        # Scheduler-Thread: nur weiterreichen
+        self._worker.submit(self._wd_key, self._watchdog)
+
+    def _sample(self, player, proc):
+        """(läuft, Fortschritt) – Frame-Zähler/time-pos per IPC; ohne IPC Fortschritt None."""
+        if player is None:
+            return proc is not None and proc.poll() is None, None
+        if not player.showing("rtsp"):
+            return False, False
+
+        now = time.monotonic()
+        frame = player.get_property("estimated-frame-number", timeout=0.5)
+        pos = player.get_property("time-pos", timeout=0.5)
+        progress = (frame is not None and frame != self._wd_frame) or (pos is not None and pos != self._wd_pos)
+
+        dt = now - self._wd_ts
+        if frame is not None and self._wd_frame is not None and frame >= self._wd_frame and dt > 0:
+            self._fps = round((frame - self._wd_frame) / dt, 1)
+        self._wd_frame, self._wd_pos, self._wd_ts = frame, pos, now
+        return True, progress
+
+    def _watchdog(self):
+        # Worker-Thread; IPC-Abfragen ohne Lock, damit info()/stop_only() nicht warten
+        with self._lock:
+            if self._url is None:
+                return
+            url, player, proc = self._url, self._player, self._proc
+
+        try:
+            alive, progress = self._sample(player, proc)
+        except Exception as e:
+            self.log.add(f"RTSP: Watchdog Fehler: {e}")
+            alive, progress = False, False
+
+        now = time.monotonic()
+        reconnect = False
+        with self._lock:
+            if self._url != url:
+                return
+            if progress is None:
+                # ohne IPC: nur das Prozessende ist ein Hänger; nach einem Reconnect
+                # gilt der neue Prozess als erholt, wenn er das Budget überlebt
+                hung = not alive
+                progress = alive and (not self._stalled or now - self._progress_ts >= self.stall_budget)
+            else:
+                hung = not alive or now - self._progress_ts >= self.stall_budget
+            if progress:
+                if self._stalled:
+                    stalled_for = now - self._stall_ts
+                    self.stall_total += stalled_for
+                    self.log.add(f"RTSP: Stream läuft wieder (Hänger {stalled_for:.1f}s)")
+                self._stalled = False
+                self._progress_ts = now
+                self._backoff = 0
+                self._next_reconnect = 0.0
+            else:
+                self._fps = 0.0 if alive and player is not None else None
+                if hung and not self._stalled:
+                    self._stalled = True
+                    self._stall_ts = self._progress_ts
+                    self.stalls += 1
+                    self.log.add(f"RTSP: Stream hängt ({'beendet' if not alive else f'{now - self._progress_ts:.1f}s ohne Frames'})")
+                if hung and now >= self._next_reconnect:
+                    reconnect = True
+                    # jeder Versuch bekommt das volle Budget (RTSP-Handshake), danach Backoff
+                    delay = min(self.reconnect_max, max(self.stall_budget, float(2 ** self._backoff)))
+                    self._backoff += 1
+                    self._progress_ts = now
+                    self._next_reconnect = now + delay
+
+        if reconnect:
+            self._reconnect(url)
+        with self._lock:
+            if self._url == url:
+                self._scheduler.schedule(self._wd_key, self._wd_interval(), self._wd_tick)
+
+    def _reconnect(self, url: str):
+        """
+        Worker-Thread; Timer/Restzeit bleiben unverändert. mpv-/Prozessstart
+        laufen ohne self._lock, übernommen wird nur, wenn `url` noch läuft.
+        """
+        with self._lock:
+            if self._url != url:
+                return
+            self.reconnects += 1
+            n = self.reconnects
+            player, proc = self._player or self._mpv, self._proc
+            mode, layout, urls, modes = self._mode, self._layout, list(self._urls), list(self._tile_modes)
+        self.log.add(f"RTSP: Reconnect #{n} {url}")
+        try:
+            if self._mpv is not None:
+                # nach einem mpv-Neustart sind die Props wieder Default -> immer neu setzen
+                player.ensure()
+                with self._lock:
+                    if self._url != url:
+                        return
+                    self._load(player, url, self._mode, self._layout, self._urls, self._tile_modes)
+                    self._player = player
+            else:
+                self._kill_group(proc, "RTSP")
+                new = self._spawn(url, mode, layout, urls, modes)
+                with self._lock:
+                    if self._url != url or self._proc is not proc:
+                        # inzwischen gestoppt oder neu gestartet
+                        self._kill_group(new, "RTSP")
+                        return
+                    self._proc = new
+                self._sup.watch(new, "RTSP")
+        except Exception as e:
+            self.log.add(f"RTSP: Reconnect fehlgeschlagen: {e}")
+
+    def set_mode(self, mode: str) -> bool:
+        """Bildmodus des laufenden Streams live umschalten (vf/keepaspect), Timer bleibt."""
+        mode = (mode or "normal").lower().strip()
+        if mode not in MODES:
+            return False
+        with self._lock:
+            if self._mpv is None or not self._alive():
+                return False
+            return self._apply_mode(mode)
+
+    def _apply_mode(self, mode: str) -> bool:
+        if self._layout:
+            return self._apply_tile_mode(mode)
+        if mode == self._mode:
+            return True
+        vf, keepaspect = self._props(self._url, mode)
+        t0 = time.perf_counter()
+        try:
+            self._set_mode_props(self._player, vf, keepaspect)
+        except Exception as e:
+            self.log.add(f"RTSP: Moduswechsel fehlgeschlagen: {e}")
+            return False
+        self.log.add(f"RTSP: Modus {self._mode} -> {mode} live ({(time.perf_counter() - t0) * 1000:.1f} ms)")
+        self._mode = mode
+        self._applied = (vf, keepaspect)
+        return True
+
+    def _apply_tile_mode(self, mode: str) -> bool:
+        # Layout: Modus gilt für alle Kacheln; lavfi-complex nur per loadfile -> kurzer Reload
+        modes = [mode] * len(self._urls)
+        if modes == self._tile_modes:
+            return True
+        try:
+            self._load(self._player, self._url, mode, self._layout, self._urls, modes)
+        except Exception as e:
+            self.log.add(f"RTSP: Moduswechsel fehlgeschlagen: {e}")
+            return False
+        self.log.add(f"RTSP: Modus {mode} für alle Kacheln ({self._layout}, neu geladen)")
+        self._mode = mode
+        self._tile_modes = modes
+        return True
+
+    @staticmethod
+    def _set_mode_props(mpv, vf: str, keepaspect: bool):
+        mpv.set_property("vf", vf)
+        mpv.set_property("keepaspect", keepaspect)
+
+    def _release_player(self):
+        """Stream im aktuellen mpv beenden (Standby: zurück in den Standby)."""
+        player, self._player = self._player, None
+        if player is None:
+            return
+        if self._standby is not None and player is self._standby.mpv:
+            self._standby.release()
+        elif player.unload("rtsp"):
+            self._reset_props()
+
+    def _on_end_file(self, ev):
+        # "stop" = durch loadfile/stop ersetzt; error/eof = Stream abgebrochen
+        player = self._player
+        if ev.get("reason") not in ("error", "eof") or player is None or not player.showing("rtsp"):
+            return
+        # läuft auf dem IPC-Reader-Thread: keine Locks/Kommandos (start() wartet evtl. auf eine Antwort)
+        player.owner = None
+        self.log.add(f"RTSP: Stream beendet ({ev.get('reason')}: {ev.get('file_error', '-')})")
+        self._kick_watchdog()
+
+    def _kick_watchdog(self, ev=None):
+        # Watchdog sofort statt erst beim nächsten Tick (verbindet neu)
+        if self._scheduler.deadline(self._wd_key) is not None:
+            self._scheduler.schedule(self._wd_key, 0, self._wd_tick)
+
     def stop_only(self):
         """Stoppt nur den RTSP-Prozess und Timer – ohne Relais/Overlay/Idle-Logik."""
         with self._lock:
-            if self._timer and self._timer.is_alive():
-                self._timer.cancel()
-            self._timer = None
+            self._scheduler.cancel(self._timer_key)
+            self._arm_seq += 1
+            self._scheduler.cancel(self._wd_key)
+            if self._stalled:
+                self.stall_total += time.monotonic() - self._stall_ts
+                self._stalled = False
+            self._fps = None
 
+            if self._mpv is not None:
+                self._release_player()
             self._kill_group(self._proc, "RTSP")
             self._proc = None
             self._url = None
             self._end_ts = None
             self._mode = "normal"
+            self._set_layout(None, (), ())
+            self._applied = None
 
             self.log.add("RTSP: stop_only (nur Stream beendet)")
 
+    def _reset_props(self):
+        # Bildmodus nicht ans Overlay vererben
+        try:
+            self._mpv.set_property("vf", "")
+            self._mpv.set_property("keepaspect", True)
+            if self._layout:
+                self._clear_layout_props(self._mpv)
+        except Exception:
+            pass
+
     def stop(self):
         """Alias für stop_only (kompatibel)."""
         self.stop_only()
 
+    def _alive(self) -> bool:
+        if self._mpv is not None:
+            return self._url is not None and self._player is not None and self._player.showing("rtsp")
+        return self._proc is not None and self._proc.poll() is None
+
     def running(self) -> bool:
         with self._lock:
-            return self._proc is not None and self._proc.poll() is None
+            return self._alive()
 
     def info(self):
         with self._lock:
-            proc = self._proc
-            if proc is None or proc.poll() is not None:
-                return {"running": False, "url": None, "remaining": 0, "mode": "normal"}
+            now = time.monotonic()
+            health = {
+                "stalled": self._stalled and self._url is not None,
+                "stall_s": round(now - self._stall_ts, 1) if self._stalled and self._url is not None else 0.0,
+                "stall_total_s": round(self.stall_total, 1),
+                "stalls": self.stalls,
+                "reconnects": self.reconnects,
+                "fps": self._fps,
+            }
+            if not self._alive():
+                return {"running": False, "url": None, "remaining": 0, "mode": "normal",
+                        "layout": None, "urls": [], **health}
 
-            remaining = int(self._end_ts - time.time()) if self._end_ts else 0
+            remaining = int(self._end_ts - now) if self._end_ts else 0
             return {
                 "running": True,
                 "url": self._url,
                 "remaining": max(0, remaining),
                 "mode": self._mode,
+                "layout": self._layout,
+                "urls": list(self._urls) or [self._url],
+                "source": self._probe.peek(self._url) if self._probe is not None else None,
+                **health,
             }
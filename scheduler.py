@@ -0,0 +1,195 @@
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class DeadlineScheduler:
+    """
+    Ein einziger Thread für alle Ablauf-Timer (Relay, RTSP) statt einem
+    threading.Timer pro Aufruf.
+
+    - Deadlines sind time.monotonic() (unempfindlich gegen Uhrzeit-Sprünge)
+    - pro Schlüssel gibt es höchstens eine aktive Deadline
+    - Verschieben nach hinten (typisch: Touch verlängert den Timer) ist O(1):
+      nur der Eintrag wird aktualisiert, der Heap-Knoten wird erst beim
+      Fälligwerden neu einsortiert
+    - Callbacks laufen auf dem Scheduler-Thread und sollten kurz sein
+    """
+
+    def __init__(self, log=None):
+        self.log = log
+
+        self._cond = threading.Condition()
+        self._heap = []      # (heap_deadline, seq, key)
+        self._entries = {}   # key -> [deadline, seq, fn]
+        self._seq = itertools.count()
+        self._thread = None
+        self._stop = False
+        self.fired = 0
+
+    def _ensure_thread(self):
+        # nur unter self._cond aufrufen
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def schedule(self, key, delay: float, fn):
+        """Setzt (oder verschiebt) die Deadline für key auf jetzt + delay Sekunden."""
+        deadline = time.monotonic() + max(0.0, delay)
+        with self._cond:
+            e = self._entries.get(key)
+            if e is not None and deadline >= e[0]:
+                # O(1): später als bisher -> Heap-Knoten bleibt, wird beim Pop nachsortiert
+                e[0] = deadline
+                e[2] = fn
+                return
+
+            seq = next(self._seq)
+            self._entries[key] = [deadline, seq, fn]
+            heapq.heappush(self._heap, (deadline, seq, key))
+            self._compact()
+            self._ensure_thread()
+            self._cond.notify()
+
+    def cancel(self, key) -> bool:
+        with self._cond:
+            # Heap-Knoten bleibt liegen und wird beim Pop verworfen
+            return self._entries.pop(key, None) is not None
+
+    def remaining(self, key):
+        """Sekunden bis zur Deadline von key (None wenn keine aktiv)."""
+        with self._cond:
+            e = self._entries.get(key)
+            if e is None:
+                return None
+            return max(0.0, e[0] - time.monotonic())
+
+    def deadline(self, key):
+        """Monotone Deadline von key (None wenn keine aktiv)."""
+        with self._cond:
+            e = self._entries.get(key)
+            return e[0] if e is not None else None
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._entries)
+
+    def info(self):
+        with self._cond:
+            return {"pending": len(self._entries), "heap": len(self._heap), "fired": self.fired}
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def _compact(self):
+        # verwaiste Heap-Knoten (cancel / vorgezogene Deadlines) begrenzen
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [(e[0], e[1], k) for k, e in self._entries.items()]
+            heapq.heapify(self._heap)
+
+    def _next_due(self):
+        # nur unter self._cond aufrufen; liefert fn oder None nach _stop
+        while not self._stop:
+            if not self._heap:
+                self._cond.wait()
+                continue
+
+            hd, seq, key = self._heap[0]
+            e = self._entries.get(key)
+            if e is None or e[1] != seq:
+                heapq.heappop(self._heap)
+                continue
+
+            now = time.monotonic()
+            if e[0] > now:
+                if hd < e[0]:
+                    # Deadline wurde nach hinten verschoben -> neu einsortieren
+                    heapq.heapreplace(self._heap, (e[0], seq, key))
+                    continue
+                self._cond.wait(e[0] - now)
+                continue
+
+            heapq.heappop(self._heap)
+            del self._entries[key]
+            self.fired += 1
+            return key, e[2]
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                due = self._next_due()
+            if due is None:
+                return
+            key, fn = due
+            try:
+                fn()
+            except Exception as e:
+                if self.log:
+                    self.log.add(f"Scheduler: Fehler in {key}: {e}")
+
+
+class Worker:
+    """
+    Ein Thread für blockierende Arbeit (mpv IPC, ensure(), loadfile, Prozessstart),
+    die von Scheduler-Deadlines oder Event-Threads (Reactor, IPC-Reader) angestoßen
+    wird – deren Threads bleiben damit kurz.
+
+    - submit(key, fn) reiht fn ein und kehrt sofort zurück
+    - ein noch wartender Auftrag mit demselben Schlüssel wird nur ersetzt
+      (kein Stau, wenn z. B. ein Tick länger dauert als sein Intervall)
+    - Aufträge laufen nacheinander; der Thread startet beim ersten submit()
+    """
+
+    def __init__(self, log=None, name: str = "worker"):
+        self.log = log
+        self.name = name
+
+        self._cond = threading.Condition()
+        self._queue = deque()   # Schlüssel in Einreihungsreihenfolge
+        self._jobs = {}         # key -> fn
+        self._thread = None
+        self._stop = False
+        self.done = 0
+
+    def submit(self, key, fn):
+        with self._cond:
+            if key not in self._jobs:
+                self._queue.append(key)
+            self._jobs[key] = fn
+            if not (self._thread and self._thread.is_alive()):
+                self._stop = False
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._jobs)
+
+    def stop(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._stop:
+                    self._cond.wait()
+                if self._stop:
+                    return
+                key = self._queue.popleft()
+                fn = self._jobs.pop(key)
+            try:
+                fn()
+            except Exception as e:
+                if self.log:
+                    self.log.add(f"{self.name}: Fehler in {key}: {e}")
+            self.done += 1
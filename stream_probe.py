@@ -0,0 +1,126 @@
+import json
+import time
+import shutil
+import subprocess
+import threading
+
+
+class StreamProbeCache:
+    """
+    Metadaten pro RTSP-URL (Auflösung, Codec, fps) mit TTL.
+
+    Gefüllt wird der Cache normalerweise kostenlos aus der laufenden
+    Wiedergabe (mpv meldet Größe/Codec/fps jeder Spur in track-list, siehe
+    RtspPlayer). Ohne IPC probt refresh() per ffprobe im Hintergrund – das
+    kostet einen eigenen RTSP-Handshake und blockiert daher nie den Start.
+
+    get() liefert nur frische Einträge; abgelaufene werden beim nächsten
+    Abspielen bzw. refresh() neu gelernt.
+    """
+
+    def __init__(self, log, ttl: float = 3600.0, probe_timeout: float = 8.0):
+        self.log = log
+        self.ttl = ttl
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._entries = {}      # url -> {"width", "height", "codec", "fps", "ts", "source"}
+        self._probing = set()
+        self.hits = 0
+        self.misses = 0
+        self.probes = 0
+
+    def get(self, url: str):
+        with self._lock:
+            e = self._entries.get(url)
+            if e is None or time.monotonic() - e["ts"] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return dict(e)
+
+    def peek(self, url: str):
+        """Eintrag auch abgelaufen, ohne Statistik (für Status-Ausgaben)."""
+        with self._lock:
+            e = self._entries.get(url)
+            return {k: v for k, v in e.items() if k != "ts"} if e else None
+
+    def size(self, url: str):
+        """(width, height) oder None."""
+        e = self.get(url)
+        return (e["width"], e["height"]) if e else None
+
+    def put(self, url: str, width, height, codec=None, fps=None, source: str = "mpv"):
+        try:
+            width, height = int(width), int(height)
+        except (TypeError, ValueError):
+            return
+        if width <= 0 or height <= 0:
+            return
+        with self._lock:
+            prev = self._entries.get(url)
+            self._entries[url] = {
+                "width": width,
+                "height": height,
+                "codec": codec,
+                "fps": round(float(fps), 2) if fps else None,
+                "ts": time.monotonic(),
+                "source": source,
+            }
+        if prev is None or (prev["width"], prev["height"]) != (width, height):
+            self.log.add(f"Probe: {url} {width}x{height} {codec or '?'} {fps or '?'}fps ({source})")
+
+    def refresh(self, url: str):
+        """ffprobe im Hintergrund, wenn kein frischer Eintrag da ist (No-op ohne ffprobe)."""
+        with self._lock:
+            e = self._entries.get(url)
+            if e is not None and time.monotonic() - e["ts"] <= self.ttl:
+                return
+            if url in self._probing or not shutil.which("ffprobe"):
+                return
+            self._probing.add(url)
+        threading.Thread(target=self._probe, args=(url,), daemon=True).start()
+
+    def _probe(self, url: str):
+        try:
+            self.probes += 1
+            p = subprocess.run(
+                [
+                    "ffprobe", "-v", "error",
+                    "-rtsp_transport", "tcp",
+                    "-select_streams", "v:0",
+                    "-show_entries", "stream=width,height,codec_name,avg_frame_rate",
+                    "-of", "json",
+                    url,
+                ],
+                capture_output=True, text=True, timeout=self.probe_timeout,
+            )
+            streams = json.loads(p.stdout or "{}").get("streams") or []
+            if not streams:
+                self.log.add(f"Probe: {url} ohne Videostream ({(p.stderr or '').strip()[:120]})")
+                return
+            s = streams[0]
+            self.put(url, s.get("width"), s.get("height"), s.get("codec_name"),
+                     _rate(s.get("avg_frame_rate")), source="ffprobe")
+        except Exception as e:
+            self.log.add(f"Probe: {url} Fehler: {e}")
+        finally:
+            with self._lock:
+                self._probing.discard(url)
+
+    def info(self):
+        now = time.monotonic()
+        with self._lock:
+            entries = {
+                url: {**{k: v for k, v in e.items() if k != "ts"}, "age_s": int(now - e["ts"])}
+                for url, e in self._entries.items()
+            }
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "probes": self.probes}
+
+
+def _rate(value):
+    # ffprobe: "25/1", "30000/1001", "0/0"
+    try:
+        num, den = str(value).split("/")
+        return float(num) / float(den) if float(den) else None
+    except (ValueError, ZeroDivisionError):
+        return None
@@ -1,25 +1,57 @@
+import os
 import time
-import threading
 from evdev import InputDevice, ecodes
 
+from input_reactor import InputReactor
+from gestures import UnlockDetector
+from scheduler import DeadlineScheduler
+
 class TouchController:
-    def __init__(self, device_path: str, unlock_touches: int, unlock_window: int, log):
+    def __init__(self, device_path: str, unlock_touches: int, unlock_window: int, log,
+                 refire_interval: float = 2.0, reactor=None, unlock_pattern: str = "", scheduler=None):
         self.device_path = device_path
         self.unlock_touches = unlock_touches
         self.unlock_window = unlock_window
+        self.refire_interval = refire_interval
         self.log = log
 
         self.touch_disabled = False
         self.touch_locked = False
 
         self._dev = None
-        self._thread = None
+        self._reactor = reactor or InputReactor(log)
+        self._scheduler = scheduler or DeadlineScheduler(log)
+        self._refire_key = f"touch-refire:{device_path}"
+        self._hold_key = f"touch-hold:{device_path}"
+        self._monitoring = False
 
-        self._unlock_counter = 0
-        self._unlock_start = None
+        try:
+            self._unlock = UnlockDetector(unlock_pattern or f"taps:{unlock_touches}", unlock_window)
+        except ValueError as e:
+            self.log.add(f"Touch: UNLOCK_PATTERN ungültig ({e}) -> taps:{unlock_touches}")
+            self._unlock = UnlockDetector(f"taps:{unlock_touches}", unlock_window)
 
         self._on_touch = None  # callback
 
+        # Gesten-Erkennung: Events werden pro SYN_REPORT-Frame ausgewertet,
+        # Callback einmal bei touch-down (+ refire solange der Finger liegt).
+        # Ein ruhender Finger erzeugt keine Frames -> refire per Scheduler-Deadline,
+        # ausgeführt auf dem Reactor-Thread (kein Lock auf dem Frame-Zustand nötig)
+        self._btn_touch = None      # BTN_TOUCH Zustand (None = Device liefert keinen)
+        self._mt_slot = 0
+        self._mt_active = set()     # Slots mit aktiver Tracking-ID
+        self._frame_abs = False     # ABS-Bewegung im aktuellen Frame
+        self._x = 0                 # letzte Position (Geräte-Koordinaten)
+        self._y = 0
+        self._down = False
+        self._last_fire = 0.0
+
+        self.events = 0
+        self.gestures = 0
+        self.fired = 0
+        # Kernel-Zeitstempel (CLOCK_REALTIME) des Frames, der den letzten Callback ausgelöst hat
+        self.last_frame_ts = 0.0
+
     def set_on_touch(self, cb):
         self._on_touch = cb
 
@@ -29,7 +61,14 @@ class TouchController:
             self.log.add(f"Touch: geöffnet {self._dev.path} ({self._dev.name})")
 
     def _apply_state(self):
-        self._ensure_dev()
+        # grab/ungrab nur auf dem Reactor-Thread (dort wird _dev gesetzt/verworfen)
+        self._reactor.call(self._apply_grab)
+
+    def _apply_grab(self):
+        if self._dev is None:
+            # Zustand bleibt gespeichert und wird von _attach() angewendet
+            self.log.add("Touch: Device nicht verbunden -> grab-Zustand beim Wiederverbinden")
+            return
         try:
             if self.touch_disabled or self.touch_locked:
                 self._dev.grab()
@@ -44,8 +83,7 @@ class TouchController:
         # Soft-disable: OS blocken, Script reagiert weiter
         self.touch_locked = False      # wichtig: Hard-Lock aus
         self.touch_disabled = True
-        self._unlock_counter = 0
-        self._unlock_start = None
+        self._unlock.reset()
         self._apply_state()
         self.log.add("Touch: disable() -> OS geblockt, Script reagiert weiter")
 
@@ -54,16 +92,14 @@ class TouchController:
         # vollständig frei: OS bekommt Touch wieder
         self.touch_locked = False      # wichtig: Hard-Lock aus
         self.touch_disabled = False
-        self._unlock_counter = 0
-        self._unlock_start = None
+        self._unlock.reset()
         self._apply_state()
         self.log.add("Touch: enable() -> OS bekommt Touch wieder")
 
 
     def lock(self):
         self.touch_locked = True
-        self._unlock_counter = 0
-        self._unlock_start = None
+        self._unlock.reset()
         self._apply_state()
 
     def unlock(self):
@@ -71,45 +107,184 @@ class TouchController:
         self._apply_state()
 
     def start_monitor(self):
-        if self._thread and self._thread.is_alive():
+        if self._monitoring:
             return
-        self._thread = threading.Thread(target=self._run, daemon=True)
-        self._thread.start()
+        self._monitoring = True
+
+        # Hotplug: Touch-Controller-Reset / späteres Einstecken ohne Neustart
+        watch_dir = os.path.dirname(self.device_path) or "/dev/input"
+        if not self._reactor.watch_dir(watch_dir, self._on_hotplug):
+            self.log.add(f"Touch: inotify auf {watch_dir} nicht möglich (kein Hotplug)")
+        self._reactor.start()
+
+        # Attach läuft wie Hotplug/Device-Fehler auf dem Reactor-Thread
+        self.log.add("Touch: monitor startet")
+        self._reactor.call(self._attach)
 
-    def _run(self):
+    def _attach(self) -> bool:
+        """Device öffnen, beim Reactor anmelden und aktuellen grab-Zustand anwenden (Reactor-Thread)."""
+        if self._dev is not None:
+            return True
         try:
             self._ensure_dev()
-            self.log.add("Touch: monitor startet")
-            for ev in self._dev.read_loop():
-                if ev.type not in (ecodes.EV_KEY, ecodes.EV_ABS):
-                    continue
-
-                if self.touch_locked:
-                    self.log.add("Touch: ignoriert (HARD-LOCK)")
-                    continue
-
-                # Touch event -> callback
-                if self._on_touch:
-                    self._on_touch()
-
-                # unlock pattern nur wenn touch_disabled aktiv
-                if self.touch_disabled:
-                    now = time.time()
-                    if self._unlock_start is None or (now - self._unlock_start > self.unlock_window):
-                        self._unlock_start = now
-                        self._unlock_counter = 1
-                    else:
-                        self._unlock_counter += 1
-
-                    self.log.add(f"Touch: unlock {self._unlock_counter}/{self.unlock_touches}")
-
-                    if self._unlock_counter >= self.unlock_touches:
-                        self.log.add("Touch: unlock pattern erkannt -> enable()")
-                        self.enable()
-
         except FileNotFoundError:
-            self.log.add(f"Touch: Device nicht gefunden: {self.device_path}")
+            self.log.add(f"Touch: Device nicht gefunden: {self.device_path} (warte auf Hotplug)")
+            return False
         except PermissionError:
             self.log.add(f"Touch: PermissionError: {self.device_path} (udev/gruppenrechte)")
+            return False
         except Exception as e:
             self.log.add(f"Touch: monitor Fehler: {e}")
+            return False
+
+        self._reset_contact()
+        self._read_axes()
+        self._reactor.add(self._dev, self._on_events, self._on_device_error)
+        if self.touch_disabled or self.touch_locked:
+            self._apply_grab()
+        return True
+
+    def _reset_contact(self):
+        # Frame-Zustand des alten Devices verwerfen, kein refire/longpress für einen Finger,
+        # dessen touch-up nie mehr kommt
+        self._btn_touch = None
+        self._mt_active.clear()
+        self._frame_abs = False
+        self._down = False
+        self._scheduler.cancel(self._refire_key)
+        self._scheduler.cancel(self._hold_key)
+
+    def _read_axes(self):
+        # Achsenbereich für die Ecken-Erkennung der Unlock-Geste
+        try:
+            caps = dict(self._dev.capabilities(absinfo=True).get(ecodes.EV_ABS, []))
+            ax = caps.get(ecodes.ABS_MT_POSITION_X) or caps.get(ecodes.ABS_X)
+            ay = caps.get(ecodes.ABS_MT_POSITION_Y) or caps.get(ecodes.ABS_Y)
+            if ax and ay:
+                self._unlock.set_axes(ax.min, ax.max, ay.min, ay.max)
+        except Exception as e:
+            self.log.add(f"Touch: Achsen nicht lesbar ({e})")
+
+    def _on_hotplug(self, name: str, mask: int):
+        # irgendeine Änderung in /dev/input: wenn getrennt, erneut versuchen
+        # (udev legt Symlink an und setzt Rechte ggf. erst danach)
+        if self._dev is None and os.path.exists(self.device_path):
+            if self._attach():
+                self.log.add(f"Touch: Hotplug -> wieder verbunden ({name})")
+
+    def _on_device_error(self, dev, exc):
+        self.log.add(f"Touch: Device weg ({exc}) -> warte auf Hotplug")
+        try:
+            dev.close()
+        except Exception:
+            pass
+        self._dev = None
+        self._reset_contact()
+        # Reset kann schon vorbei sein (Symlink zeigt auf neues eventN)
+        if os.path.exists(self.device_path):
+            self._attach()
+
+    def _fire(self, now: float):
+        self._last_fire = now
+        self.fired += 1
+        if self._down and self.refire_interval > 0:
+            self._scheduler.schedule(self._refire_key, self.refire_interval,
+                                     lambda: self._reactor.call(self._refire))
+        if self._on_touch:
+            self._on_touch()
+
+    def _refire(self):
+        # Finger liegt noch -> erneut auslösen (und neu planen); eine veraltete
+        # Deadline nach neuem touch-down wird über _last_fire verworfen
+        now = time.monotonic()
+        if (self._down and not self.touch_locked and self.refire_interval > 0
+                and now - self._last_fire >= self.refire_interval):
+            self._fire(now)
+
+    def _touch_down(self, now: float):
+        self.gestures += 1
+
+        if self.touch_locked:
+            self.log.add("Touch: ignoriert (HARD-LOCK)")
+            return
+
+        # Touch-Geste -> callback
+        self._fire(now)
+
+        # unlock pattern nur wenn touch_disabled aktiv (zählt Taps, nicht Events)
+        if self.touch_disabled:
+            if self._unlock.on_down(now, self._x, self._y):
+                self._unlocked()
+                return
+            self.log.add(f"Touch: unlock {self._unlock.progress()}")
+            # longpress: Deadline ab touch-down, ein ruhender Finger liefert keine Frames
+            hold = self._unlock.hold_time()
+            if hold is not None:
+                self._scheduler.schedule(self._hold_key, hold, lambda: self._reactor.call(self._hold))
+
+    def _hold(self):
+        if self._down and self.touch_disabled and self._unlock.on_hold(time.monotonic()):
+            self._unlocked()
+
+    def _unlocked(self):
+        self.log.add(f"Touch: unlock pattern erkannt ({self._unlock.pattern}) -> enable()")
+        self.enable()
+
+    def _end_frame(self):
+        if self._btn_touch is not None:
+            down = self._btn_touch
+        elif self._mt_active:
+            down = True
+        else:
+            # Device ohne BTN_TOUCH/Tracking-ID: Bewegung im Frame = Finger liegt
+            down = self._frame_abs
+        self._frame_abs = False
+
+        now = time.monotonic()
+        if down and not self._down:
+            self._down = True
+            self._touch_down(now)
+        elif down:
+            # Finger bleibt liegen (refire kommt über die Deadline, siehe _fire)
+            if self.touch_disabled and self._unlock.on_hold(now):
+                self._unlocked()
+        elif self._down:
+            self._down = False
+            self._scheduler.cancel(self._refire_key)
+            self._scheduler.cancel(self._hold_key)
+            self._unlock.on_up(now)
+
+    def _handle_event(self, ev):
+        self.events += 1
+        if ev.type == ecodes.EV_SYN:
+            if ev.code == ecodes.SYN_REPORT:
+                self.last_frame_ts = ev.sec + ev.usec / 1e6
+                self._end_frame()
+            elif ev.code == ecodes.SYN_DROPPED:
+                # Kernel-Puffer übergelaufen: Frame verwerfen, Zustand neu aufbauen
+                self._mt_active.clear()
+                self._frame_abs = False
+        elif ev.type == ecodes.EV_KEY:
+            if ev.code == ecodes.BTN_TOUCH:
+                self._btn_touch = bool(ev.value)
+        elif ev.type == ecodes.EV_ABS:
+            if ev.code == ecodes.ABS_MT_SLOT:
+                self._mt_slot = ev.value
+            elif ev.code == ecodes.ABS_MT_TRACKING_ID:
+                if ev.value < 0:
+                    self._mt_active.discard(self._mt_slot)
+                else:
+                    self._mt_active.add(self._mt_slot)
+            else:
+                self._frame_abs = True
+                if ev.code in (ecodes.ABS_X, ecodes.ABS_MT_POSITION_X):
+                    self._x = ev.value
+                elif ev.code in (ecodes.ABS_Y, ecodes.ABS_MT_POSITION_Y):
+                    self._y = ev.value
+
+    def _on_events(self, dev, events):
+        for ev in events:
+            self._handle_event(ev)
+
+    def stats(self):
+        return {"events": self.events, "gestures": self.gestures, "fired": self.fired}